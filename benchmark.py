@@ -0,0 +1,375 @@
+import os
+import json
+import time
+import joblib
+import argparse
+import platform
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from contextlib import contextmanager
+
+import storage
+import telemetry
+import sliding_window
+from sliding_window import generate_flatten_features, feature_cols
+
+# -----------------------------------
+# 설정: 오프라인 벤치마크 (Chrome / BigKinds / yfinance / KR-FinBert 다운로드 없이 실행)
+# -----------------------------------
+BENCHES = ['flatten', 'merge', 'sentiment', 'duckdb', 'experiments', 'predict']
+LOOP_MAX_ROWS = 20000       # 기존 루프 방식은 이 행 수까지만 비교 (이상은 너무 느림)
+MAX_MATRIX_GB = 2.0         # 윈도우 피처 행렬(float64)이 이보다 크면 해당 윈도우 생략
+SYNTHETIC_START = '1000-01-01'   # 1M일(약 2,700년)까지 4자리 연도 유지 -> 날짜 문자열 정렬 = 시간 순서
+PAGE_SIZE = 100             # 감성 분석 벤치마크 : 크롤링 1페이지 기사 수
+
+# 합성 기사 문장용 단어
+WORDS = ['삼성전자', '반도체', '메모리', '파운드리', '실적', '영업이익', '매출', '주가', '외국인', '기관',
+         '순매수', '순매도', '상승', '하락', '전망', '투자', '공급', '수요', 'HBM', 'D램', '낸드', '스마트폰',
+         '갤럭시', '미국', '중국', '관세', '환율', '금리', '코스피', '시가총액', '배당', '자사주', '분기',
+         '증권가', '목표주가', '하향', '상향', '개선', '부진', '회복']
+MEDIA = ['매일경제', '서울경제', '아주경제', '한국경제']
+
+# -----------------------------------
+# 기존 방식 (행 단위 iloc + flatten 루프) : 비교 기준
+# -----------------------------------
+def generate_flatten_features_loop(df, window_size, feature_cols, label_col='label'):
+    X, y = [], []
+    for i in range(window_size, len(df)):
+        features = df.iloc[i-window_size:i][feature_cols].values.flatten()
+        label = df.iloc[i][label_col]
+        X.append(features)
+        y.append(label)
+    return pd.DataFrame(X), pd.Series(y)
+
+def timeit(func, *args, repeat=3):
+    # repeat회 실행 중 최솟값 (초)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def record(bench, case, days, seconds, items, **extra):
+    # 결과 1건 (JSON 저장 / 이전 실행과 비교 단위)
+    return {'bench': bench, 'case': case, 'days': days, 'items': int(items),
+            'seconds': round(seconds, 6), 'items_per_sec': round(items / seconds, 1) if seconds else None, **extra}
+
+@contextmanager
+def in_dir(path):
+    # 상대 경로(models/, models/experiments)를 쓰는 함수를 임시 디렉토리에서 실행
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+
+# -----------------------------------
+# 합성 데이터 : merged_data 형식 일별 이력 + 기사
+# -----------------------------------
+def synthetic_history(n_days, articles_per_day=3.0, seed=0):
+    """ n_days일 merged_data 행 (주말 포함 연속 날짜, 주가는 random walk, 마지막 날 label = NaN) """
+    rng = np.random.default_rng(seed)
+    dates = np.datetime_as_string(np.datetime64(SYNTHETIC_START) + np.arange(n_days), unit='D')
+
+    news_count = rng.poisson(articles_per_day, n_days)
+    sentiment = rng.dirichlet([2.0, 5.0, 3.0], n_days)
+    sentiment[news_count == 0] = [0.0, 1.0, 0.0]    # 뉴스가 없는 날 -> avg_neutral = 1.0
+
+    close = 55000 * np.exp(np.cumsum(rng.normal(0, 0.015, n_days)))
+    open_ = close * (1 + rng.normal(0, 0.005, n_days))
+    spread = np.abs(rng.normal(0, 0.01, n_days)) * close
+
+    df = pd.DataFrame({
+        'date': dates,
+        'news_count': news_count,
+        'avg_negative': sentiment[:, 0].round(4),
+        'avg_neutral': sentiment[:, 1].round(4),
+        'avg_positive': sentiment[:, 2].round(4),
+        'open': open_.round(),
+        'high': (np.maximum(open_, close) + spread).round(),
+        'low': (np.minimum(open_, close) - spread).round(),
+        'close': close.round(),
+        'volume': rng.lognormal(16, 0.4, n_days).round(),
+    })
+    next_close = df['close'].shift(-1)
+    df['label'] = (next_close > df['close']).astype('Int64').where(next_close.notna())
+    return df
+
+def synthetic_articles(history, n_articles, seed=0):
+    """ n_articles건 articles 행 (date, seq, media, text, hash) : 날짜는 이력 기간 내 균등 분포 """
+    rng = np.random.default_rng(seed)
+    dates = np.sort(rng.choice(history['date'].to_numpy(), n_articles))
+    lengths = rng.integers(8, 60, n_articles)
+    words = rng.choice(WORDS, lengths.sum())
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+
+    texts = [' '.join(words[bounds[i]:bounds[i] + 6]) + " ||| " + ' '.join(words[bounds[i] + 6:bounds[i + 1]])
+             for i in range(n_articles)]
+    articles = pd.DataFrame({'date': dates, 'media': rng.choice(MEDIA, n_articles), 'text': texts})
+    articles['seq'] = articles.groupby('date').cumcount() + 1
+    articles['hash'] = articles['text'].map(storage.article_hash)
+    return articles[storage.ARTICLE_COLS]
+
+def build_tiny_bert(path, hidden_size=64, num_layers=2):
+    """ 합성 기사 문자 단위 vocab + 작은 BERT 분류기(가중치 랜덤)를 path에 저장 (다운로드 X) """
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    chars = sorted(set(''.join(WORDS) + '|') - {' '})
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + chars + ['##' + ch for ch in chars]
+    os.makedirs(path, exist_ok=True)
+    vocab_path = os.path.join(path, 'vocab.txt')
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab))
+
+    tokenizer = BertTokenizerFast(vocab_path, do_lower_case=False)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=hidden_size, num_hidden_layers=num_layers,
+                        num_attention_heads=2, intermediate_size=hidden_size * 2, num_labels=3)
+    tokenizer.save_pretrained(path)
+    BertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+def build_db(db_path, history, articles):
+    con = storage.connect(db_path)
+    storage.upsert_days(con, history, articles)
+    return con
+
+# -----------------------------------
+# 슬라이딩 윈도우 피처 생성 벤치마크
+# -----------------------------------
+def bench_flatten_features(df, windows=(5, 15, 30, 60, 120), repeat=3):
+    results = []
+    for window in windows:
+        # DataFrame 생성 시 strided view가 복사되므로 (행 x 윈도우 x 피처) 크기만큼 메모리 필요
+        matrix_gb = len(df) * window * len(feature_cols) * 8 / 1e9
+        if matrix_gb > MAX_MATRIX_GB:
+            print(f"윈도우 {window} 생략 : 피처 행렬 {matrix_gb:.1f}GB > {MAX_MATRIX_GB}GB")
+            continue
+
+        X_vec, y_vec = generate_flatten_features(df, window, feature_cols)
+        vec_sec = timeit(generate_flatten_features, df, window, feature_cols, repeat=repeat)
+        results.append(record('flatten', f'vectorized_w{window}', len(df), vec_sec, len(X_vec), window=window))
+
+        if len(df) > LOOP_MAX_ROWS:
+            continue
+
+        # 두 방식의 결과가 같은지 먼저 확인
+        X_loop, y_loop = generate_flatten_features_loop(df, window, feature_cols)
+        assert np.array_equal(X_loop.to_numpy(dtype=float), X_vec.to_numpy(dtype=float))
+        assert np.array_equal(y_loop.astype('Float64').to_numpy(dtype=float, na_value=np.nan),
+                              y_vec.astype('Float64').to_numpy(dtype=float, na_value=np.nan), equal_nan=True)
+
+        loop_sec = timeit(generate_flatten_features_loop, df, window, feature_cols, repeat=repeat)
+        results.append(record('flatten', f'loop_w{window}', len(df), loop_sec, len(X_vec), window=window,
+                              speedup=round(loop_sec / vec_sec, 1)))
+
+    return results
+
+# -----------------------------------
+# sentiment + stock merge (merge_sentiment_stock와 같은 처리)
+# -----------------------------------
+def bench_merge(history, repeat=3):
+    from update_today_data import merge_frames
+
+    sentiment = history[storage.SENTIMENT_COLS]
+    stock = history[['date'] + storage.PRICE_COLS]
+    seconds = timeit(lambda: merge_frames(sentiment.copy(), stock.copy()), repeat=repeat)
+    return [record('merge', 'merge_frames', len(history), seconds, len(history))]
+
+# -----------------------------------
+# 감성 분석 : 작은 로컬 BERT로 페이지 단위 스트리밍 처리량 (모델 크기가 아닌 파이프라인 오버헤드 측정)
+# -----------------------------------
+def bench_sentiment(history, articles, model_dir, repeat=3, backends=('fp32', 'int8')):
+    from sentiment_engine import SentimentScorer, daily_sentiment_stream
+
+    pages = [articles.iloc[i:i + PAGE_SIZE] for i in range(0, len(articles), PAGE_SIZE)]
+    results = []
+    for backend in backends:
+        scorer = SentimentScorer(model_name=model_dir, backend=backend, cache=None)
+        seconds = timeit(lambda: daily_sentiment_stream(pages, history['date'], scorer), repeat=repeat)
+        results.append(record('sentiment', f'stream_{backend}', len(history), seconds, len(articles)))
+    return results
+
+# -----------------------------------
+# DuckDB 적재 / 조회
+# -----------------------------------
+def bench_duckdb(history, articles, work_dir, repeat=3):
+    from features import load_features
+
+    results = []
+    db_path = os.path.join(work_dir, 'bench_duckdb.duckdb')
+
+    # 전체 이력 적재 (label / ffill / 파생 피처 포함) : 매번 새 DB
+    def full_save():
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        build_db(db_path, history, articles).close()
+    results.append(record('duckdb', 'upsert_full', len(history), timeit(full_save, repeat=repeat), len(history)))
+
+    con = storage.connect(db_path)
+    try:
+        # 매일 실행과 같은 마지막 1일 upsert (직전 행 label + 이후 파생 피처 갱신)
+        last_day = history.iloc[[-1]]
+        last_articles = articles[articles['date'] == last_day['date'].iloc[0]]
+        seconds = timeit(storage.upsert_days, con, last_day, last_articles, repeat=repeat)
+        results.append(record('duckdb', 'upsert_day', len(history), seconds, 1))
+
+        seconds = timeit(load_features, con, repeat=repeat)
+        results.append(record('duckdb', 'load_features', len(history), seconds, len(history)))
+
+        seconds = timeit(storage.load_articles, con, repeat=repeat)
+        results.append(record('duckdb', 'load_articles', len(history), seconds, len(articles)))
+    finally:
+        con.close()
+    return results
+
+# -----------------------------------
+# 모델 학습 : 단일 실험(run_one) / 전체 병렬 실험(run_all_experiments)
+# (임시 디렉토리에서 실행 -> 실제 models/, 실험 registry에 영향 없음)
+# -----------------------------------
+def bench_experiments(history, work_dir, repeat=1, window=5):
+    results = []
+    with in_dir(work_dir):
+        os.makedirs('models', exist_ok=True)
+        con = storage.connect('bench_experiments.duckdb')
+        try:
+            with tempfile.TemporaryDirectory(prefix="window_") as cache_dir:
+                window_paths, fingerprints = sliding_window.build_window_matrices(history, [window], feature_cols, cache_dir)
+                sliding_window.init_worker(window_paths)
+                for model in sliding_window.models:
+                    param = sliding_window.param_grid[model][0]
+                    task = (model, window, param, sliding_window.experiment_key(fingerprints[window]['data_hash'], model, window, param))
+                    seconds = timeit(sliding_window.run_one, task, repeat=repeat)
+                    results.append(record('experiments', f'run_one_{model}_w{window}', len(history), seconds, 1))
+
+            # 전체 실험 (registry 캐시 없이) : 매번 새 테이블
+            def run_all():
+                con.execute("DROP TABLE IF EXISTS experiments")
+                sliding_window.run_all_experiments(history, 'bench_experiments.duckdb')
+            n_tasks = sum(len(params) for params in sliding_window.param_grid.values()) * len(sliding_window.windows)
+            results.append(record('experiments', 'run_all_experiments', len(history), timeit(run_all, repeat=repeat), n_tasks))
+        finally:
+            con.close()
+    return results
+
+# -----------------------------------
+# 예측 : ModelRegistry 1회 예측 (cold / warm) + 전체 기간 백테스트
+# -----------------------------------
+def bench_predict(history, articles, work_dir, repeat=3):
+    import real_predict
+
+    results = []
+    model_dir = os.path.join(work_dir, 'predict_models')
+    db_path = os.path.join(work_dir, 'bench_predict.duckdb')
+    os.makedirs(model_dir, exist_ok=True)
+    build_db(db_path, history, articles).close()
+
+    # 모델별 첫 번째 파라미터로 학습한 모델 파일 (학습 시간은 experiments 벤치마크에서 측정)
+    for window in real_predict.windows:
+        X, y, _ = sliding_window.window_samples(history, window, feature_cols)
+        for model in real_predict.models:
+            fitted, _ = sliding_window.train_and_evaluate(model, X, X, y, y, sliding_window.param_grid[model][0])
+            joblib.dump(fitted, os.path.join(model_dir, f"{model}_window{window}.pkl"))
+    n_models = len(real_predict.models) * len(real_predict.windows)
+
+    results.append(record('predict', 'predict_cold', len(history),
+                          timeit(lambda: real_predict.ModelRegistry(model_dir, db_path).predict(), repeat=repeat), n_models))
+
+    registry = real_predict.ModelRegistry(model_dir, db_path)
+    registry.refresh()
+    results.append(record('predict', 'predict_warm', len(history), timeit(registry.predict, repeat=repeat), n_models))
+
+    backtest = real_predict.backtest(registry)
+    results.append(record('predict', 'backtest', len(history),
+                          timeit(real_predict.backtest, registry, repeat=repeat), len(backtest)))
+    return results
+
+# -----------------------------------
+# 전체 실행 / 비교
+# -----------------------------------
+def run_suite(days_list, n_articles, benches=BENCHES, repeat=3, data=None, seed=0):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as work_dir:
+        model_dir = build_tiny_bert(os.path.join(work_dir, 'tiny_bert')) if 'sentiment' in benches else None
+
+        # --data : 실제 CSV 이력으로 flatten 벤치마크 (기존 방식과 비교)
+        histories = [pd.read_csv(data).sort_values('date').reset_index(drop=True)] if data else \
+                    [synthetic_history(days, n_articles / days, seed) for days in days_list]
+
+        for history in histories:
+            articles = synthetic_articles(history, n_articles, seed)
+            print(f"===== {len(history)}일 / 기사 {len(articles)}건 =====")
+
+            for bench in benches:
+                start = time.perf_counter()
+                if bench == 'flatten':
+                    bench_results = bench_flatten_features(history, repeat=repeat)
+                elif bench == 'merge':
+                    bench_results = bench_merge(history, repeat)
+                elif bench == 'sentiment':
+                    bench_results = bench_sentiment(history, articles, model_dir, repeat)
+                elif bench == 'duckdb':
+                    bench_results = bench_duckdb(history, articles, work_dir, repeat)
+                elif bench == 'experiments':
+                    bench_results = bench_experiments(history, work_dir)
+                elif bench == 'predict':
+                    bench_results = bench_predict(history, articles, work_dir, repeat)
+                for result in bench_results:
+                    result['articles'] = len(articles)
+                results += bench_results
+                print(f"[{bench}] {len(bench_results)}건 ({time.perf_counter() - start:.1f}s)")
+
+    return pd.DataFrame(results)
+
+def environment():
+    import duckdb
+    import torch
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'duckdb': duckdb.__version__, 'torch': torch.__version__}
+
+def compare(results, baseline_path):
+    # 이전 실행 JSON과 (bench, case, days, articles) 기준 비교 : ratio > 1 이면 느려짐
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = pd.DataFrame(json.load(f)['results'])
+    keys = ['bench', 'case', 'days', 'articles']
+    merged = results.merge(baseline[keys + ['seconds']], on=keys, how='left', suffixes=('', '_baseline'))
+    merged['ratio'] = (merged['seconds'] / merged['seconds_baseline']).round(2)
+    return merged[keys + ['seconds_baseline', 'seconds', 'ratio']]
+
+
+if __name__ == "__main__":
+    # 전체 : python benchmark.py --days 1000 10000 --articles 2000 --output bench.json
+    # 일부 : python benchmark.py --only flatten duckdb --days 1000000
+    # 이전 실행과 비교 : python benchmark.py --compare bench_before.json --output bench_after.json
+    # 실제 CSV로 flatten 비교 : python benchmark.py --only flatten --data data/250520_weekend_sentiment_stock.csv
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--articles', type=int, default=2000, help="기간 전체 합성 기사 수")
+    parser.add_argument('--only', nargs='+', choices=BENCHES, default=BENCHES)
+    parser.add_argument('--data')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="비교할 이전 결과 JSON")
+    args = parser.parse_args()
+
+    # 합성 날짜는 KRX 휴장일 목록 범위 밖 -> 주말만 휴장 처리 경고 생략
+    warnings.filterwarnings('ignore', message='KRX')
+    # 벤치마크 실행은 stage_metrics(실제 운영 기록)에 남기지 않음
+    telemetry.enabled = False
+
+    results = run_suite(args.days, args.articles, args.only, args.repeat, args.data, args.seed)
+    print(results.to_string(index=False))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'run_at': datetime.now().isoformat(timespec='seconds'), 'args': vars(args),
+                   'environment': environment(), 'results': results.to_dict(orient='records')},
+                  f, ensure_ascii=False, indent=2, default=str)
+    print(f"결과 저장 → {args.output}")
+
+    if args.compare:
+        print(compare(results, args.compare).to_string(index=False))
@@ -0,0 +1,152 @@
+import os
+import time
+import random
+import asyncio
+import aiohttp
+from datetime import datetime
+
+# -----------------------------------
+# 설정: BigKinds 검색 API (Selenium 없이 HTTP로 직접 요청)
+# -----------------------------------
+# 로컬 stub 서버(응답 fixture 재생)로 실행할 때는 BIGKINDS_API_URL 변경
+BIGKINDS_API_URL = os.environ.get("BIGKINDS_API_URL", "https://www.bigkinds.or.kr/api/news/search.do")
+PAGE_SIZE = 100
+CONCURRENCY = 4
+MAX_RETRIES = 4
+BACKOFF = 1.0       # 재시도 대기 : BACKOFF * 2^attempt (+ jitter)
+TIMEOUT = 30
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+SEPERATOR = " ||| "
+
+# Selenium 검색 조건과 동일 : 언론사 4곳 / 경제, 국제, IT_과학 / 제목에 "삼성전자" 포함
+PROVIDERS = {'매일경제' : '02100101', '서울경제' : '02100311', '아주경제' : '02100501', '한국경제' : '02100701'}
+CATEGORY_CODES = ['002000000', '005000000', '008000000']
+OR_KEYWORD = "삼성전자"
+NOT_KEYWORD = "[속보] OR [스팟] OR 칼럼"
+
+HEADERS = {
+    'Content-Type' : 'application/json;charset=UTF-8',
+    'X-Requested-With' : 'XMLHttpRequest',
+    'User-Agent' : 'Mozilla/5.0',
+}
+
+def clean_summary(summary_html) :
+    # <br>를 줄바꿈 문자로 변환
+    parts = summary_html.replace('<br>', '\n').replace('<br/>', '\n').split('\n')
+
+    # 각 줄 공백 정리
+    parts = [part.strip() for part in parts if part.strip()]
+
+    # 마지막 줄 점검
+    if parts and '..' in parts[-1]:
+        parts = parts[:-1]  # 마지막 문장이 ".." 포함이면 버림
+
+    return ' '.join(parts)
+
+def build_query(start, end, page) :
+    # 결과 화면의 "분석 기사 / 과거순 / 100개 보기"와 같은 요청 본문
+    return {
+        'indexName' : 'news',
+        'searchKey' : OR_KEYWORD,
+        'searchKeys' : [{'orKeywords' : [OR_KEYWORD], 'notKeywords' : [NOT_KEYWORD]}],
+        'searchScopeType' : '2',        # 제목 검색
+        'searchSortType' : 'date',
+        'sortMethod' : 'date',          # 과거순
+        'startDate' : start,
+        'endDate' : end,
+        'providerCodes' : list(PROVIDERS.values()),
+        'categoryCodes' : CATEGORY_CODES,
+        'isTmUsable' : True,            # 분석 기사
+        'isNotTmUsable' : False,
+        'startNo' : page,
+        'resultNumber' : PAGE_SIZE,
+    }
+
+def parse_results(result) :
+    # API 응답 -> [{'date', 'media', 'text'}, ...] (Selenium parse_page와 같은 형식)
+    records = []
+    for item in result.get('resultList', []) :
+        # 검색 조건 외 언론사가 섞여 들어오는 경우 제외
+        media = (item.get('PROVIDER') or '').strip() or None
+        if media is not None and media not in PROVIDERS :
+            continue
+
+        final_article = item.get('TITLE', '') + SEPERATOR + clean_summary(item.get('CONTENT', ''))
+        article_date = datetime.strptime(str(item['DATE'])[:8], '%Y%m%d').strftime('%Y-%m-%d')
+        records.append({'date' : article_date, 'media' : media, 'text' : final_article})
+
+    return records
+
+def total_pages(result) :
+    return max(1, -(-int(result.get('totalCount', 0)) // PAGE_SIZE))
+
+# -----------------------------------
+# 페이지 요청 : 동시 요청 수 제한 + 재시도(지수 backoff)
+# -----------------------------------
+async def fetch_page(session, semaphore, start, end, page, api_url) :
+    async with semaphore :
+        for attempt in range(MAX_RETRIES + 1) :
+            try :
+                async with session.post(api_url, json=build_query(start, end, page), headers=HEADERS) as resp :
+                    if resp.status not in RETRY_STATUS :
+                        resp.raise_for_status()
+                        return await resp.json(content_type=None)
+                    error = f"HTTP {resp.status}"
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e :
+                error = repr(e)
+
+            if attempt == MAX_RETRIES :
+                raise RuntimeError(f"{page} 페이지 요청 실패 ({MAX_RETRIES}회 재시도) : {error}")
+
+            delay = BACKOFF * 2 ** attempt + random.uniform(0, BACKOFF)
+            print(f"{page} 페이지 요청 재시도 {attempt + 1}/{MAX_RETRIES} ({error}), {delay:.1f}s 대기")
+            await asyncio.sleep(delay)
+
+async def fetch_batch(session, semaphore, start, end, pages, api_url) :
+    return await asyncio.gather(*(fetch_page(session, semaphore, start, end, page, api_url) for page in pages))
+
+def iter_pages(start, end, first_page=1, concurrency=CONCURRENCY, api_url=None) :
+    """ (page, total_page, records)를 페이지 순서대로 반환 : concurrency개 페이지씩 동시에 요청 """
+    api_url = api_url or BIGKINDS_API_URL
+    loop = asyncio.new_event_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    session = loop.run_until_complete(_open_session())
+
+    try :
+        total_page = None
+        page = first_page
+        while total_page is None or page <= total_page :
+            if total_page is None :
+                # 첫 요청으로 전체 페이지 수 확인
+                result = loop.run_until_complete(fetch_page(session, semaphore, start, end, page, api_url))
+                total_page = total_pages(result)
+                batch = [(page, result)]
+            else :
+                pages = range(page, min(page + concurrency, total_page + 1))
+                results = loop.run_until_complete(fetch_batch(session, semaphore, start, end, pages, api_url))
+                batch = list(zip(pages, results))
+
+            for p, result in batch :
+                yield p, total_page, parse_results(result)
+            page = batch[-1][0] + 1
+    finally :
+        loop.run_until_complete(session.close())
+        loop.close()
+
+async def _open_session() :
+    return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=TIMEOUT))
+
+
+if __name__ == "__main__" :
+    # 수집 확인용 : python bigkinds.py 2025-05-20 2025-05-21
+    import sys
+    start = sys.argv[1]
+    end = sys.argv[2] if len(sys.argv) > 2 else start
+
+    t0 = time.perf_counter()
+    n_articles = 0
+    for page, total_page, records in iter_pages(start, end) :
+        n_articles += len(records)
+        print(f"{page}/{total_page} 페이지 : {len(records)}건")
+    print(f"기사 {n_articles}건, {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,117 @@
+import sys
+import duckdb
+import pandas as pd
+
+import trading_calendar
+
+# -----------------------------------
+# 설정: 파생 피처 (DuckDB window function)
+# -----------------------------------
+ENGINEERED_COLS = ['close_diff', 'momentum_5d', 'momentum_15d', '5ma', '20ma', 'sentiment_strength', 'news_density_change']
+
+# 가장 넓은 윈도우(20ma)가 참조하는 이전 행 수
+MAX_LOOKBACK = 19
+
+FEATURE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS features (
+        date VARCHAR PRIMARY KEY,
+        close_diff DOUBLE,
+        momentum_5d DOUBLE,
+        momentum_15d DOUBLE,
+        "5ma" DOUBLE,
+        "20ma" DOUBLE,
+        sentiment_strength DOUBLE,
+        news_density_change DOUBLE
+    )
+"""
+
+# 이동평균은 pandas rolling(window=n)과 같이 n개 행이 채워지기 전까지 NULL
+FEATURE_SQL = """
+    SELECT
+        date,
+        -- 1. close_diff: 전일 대비 종가 차이
+        close - lag(close, 1) OVER (ORDER BY date) AS close_diff,
+        -- 2. momentum_5d: 5일간의 모멘텀 (현재 종가 - 5일 전 종가)
+        close - lag(close, 5) OVER (ORDER BY date) AS momentum_5d,
+        -- 3. momentum_15d: 15일간의 모멘텀
+        close - lag(close, 15) OVER (ORDER BY date) AS momentum_15d,
+        -- 4. 5일 이동평균
+        CASE WHEN count(close) OVER (ORDER BY date ROWS BETWEEN 4 PRECEDING AND CURRENT ROW) = 5
+             THEN avg(close) OVER (ORDER BY date ROWS BETWEEN 4 PRECEDING AND CURRENT ROW) END AS "5ma",
+        -- 5. 20일 이동평균
+        CASE WHEN count(close) OVER (ORDER BY date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) = 20
+             THEN avg(close) OVER (ORDER BY date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) END AS "20ma",
+        -- 6. sentiment_strength: 긍정과 부정 간 감정 강도 차이 (절대값)
+        abs(avg_positive - avg_negative) AS sentiment_strength,
+        -- 7. news_density_change: 전날 대비 뉴스 개수 변화량
+        news_count - lag(news_count, 1) OVER (ORDER BY date) AS news_density_change
+    FROM {source}
+    WHERE date >= ?
+"""
+
+# -----------------------------------
+# 피처 테이블 갱신 : since 이후 행만 재계산 (트랜잭션은 호출 측에서 관리)
+# -----------------------------------
+def refresh_features(con, since=None):
+    con.execute(FEATURE_SCHEMA)
+
+    if since is None:
+        # 전체 재계산
+        source_start = ''
+        since = ''
+    else:
+        # since 이전 MAX_LOOKBACK개 행까지만 읽어서 window 계산
+        row = con.execute(f"""
+            SELECT min(date) FROM (
+                SELECT date FROM merged_data WHERE date < ? ORDER BY date DESC LIMIT {MAX_LOOKBACK}
+            )
+        """, [since]).fetchone()
+        source_start = row[0] or since
+
+    con.execute("DELETE FROM features WHERE date >= ?", [since])
+    con.execute(f"""
+        INSERT INTO features
+        SELECT * FROM ({FEATURE_SQL.format(source='merged_data')}) WHERE date >= ?
+    """, [source_start, since])
+
+# -----------------------------------
+# 학습/예측용 데이터 : merged_data + 파생 피처
+# weekday=True : 주말/공휴일 미포함 (KRX 거래일 행만 남기고 파생 피처도 거래일 기준으로 계산)
+# -----------------------------------
+def load_features(con, dropna=False, weekday=False):
+    if weekday:
+        dates = con.execute("SELECT date FROM merged_data ORDER BY date").fetchdf()['date']
+        con.register("trading_dates", pd.DataFrame({'date' : dates[trading_calendar.is_trading_day(dates)]}))
+        df = con.execute(f"""
+            WITH weekday_data AS (
+                SELECT * FROM merged_data WHERE date IN (SELECT date FROM trading_dates)
+            )
+            SELECT m.*, f.* EXCLUDE (date)
+            FROM weekday_data m LEFT JOIN ({FEATURE_SQL.format(source='weekday_data')}) f USING (date)
+            ORDER BY m.date
+        """, ['']).fetchdf()
+        con.unregister("trading_dates")
+    else:
+        df = con.execute("""
+            SELECT m.*, f.* EXCLUDE (date)
+            FROM merged_data m LEFT JOIN features f USING (date)
+            ORDER BY m.date
+        """).fetchdf()
+
+    # 윈도우가 채워지지 않은 초기 구간 제거 (노트북 generate_custom_features와 동일)
+    if dropna:
+        df = df.dropna(subset=[col for col in ENGINEERED_COLS if col != 'sentiment_strength'])
+        df = df.reset_index(drop=True)
+
+    return df
+
+
+if __name__ == "__main__":
+    # 피처 테이블 전체 재계산
+    # python features.py sentiment_stock.duckdb
+    con = duckdb.connect(sys.argv[1])
+    con.execute("BEGIN TRANSACTION")
+    refresh_features(con)
+    con.execute("COMMIT")
+    print(f"피처 테이블 재계산 완료: {con.execute('SELECT count(*) FROM features').fetchone()[0]}행")
+    con.close()
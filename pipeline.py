@@ -0,0 +1,139 @@
+import json
+import time
+import hashlib
+import traceback
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import storage
+import telemetry
+
+# -----------------------------------
+# 설정: 단계 실행 기록 (입력이 같으면 다시 실행하지 않음)
+# -----------------------------------
+RETRIES = 2         # 단계별 재시도 횟수 (실패한 단계만 다시 실행)
+RETRY_DELAY = 5.0   # 재시도 대기 : RETRY_DELAY * 2^attempt
+MAX_WORKERS = 4
+
+PIPELINE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pipeline_runs (
+        run_key VARCHAR,
+        stage VARCHAR,
+        input_hash VARCHAR,
+        output_hash VARCHAR,
+        status VARCHAR,         -- success / failed
+        attempts INTEGER,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        error VARCHAR
+    )
+"""
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def frame_fingerprint(df):
+    # DataFrame 내용 해시 (단계 출력 비교용)
+    digest = hashlib.sha256(','.join(map(str, df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+# -----------------------------------
+# 단계 DAG : 의존성이 끝난 단계부터 동시에 실행
+# stage 함수는 인자 없이 호출되고 출력 fingerprint(str)를 반환 (데이터는 DB를 통해 전달)
+# -----------------------------------
+class Pipeline:
+    def __init__(self, run_key, db_path=storage.DB_PATH):
+        self.run_key = run_key
+        self.db_path = db_path
+        self.stages = {}    # name -> (func, deps, params, volatile)
+
+    def add(self, name, func, deps=(), params=None, volatile=False):
+        # volatile : 입력이 같아도 항상 실행 (ex. 오늘 날짜 크롤링)
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"{name} : 정의되지 않은 선행 단계 {missing}")
+        self.stages[name] = (func, tuple(deps), params, volatile)
+
+    def last_success(self, stage, input_hash):
+        con = storage.connect(self.db_path)
+        try:
+            con.execute(PIPELINE_SCHEMA)
+            row = con.execute("""
+                SELECT output_hash FROM pipeline_runs
+                WHERE stage = ? AND input_hash = ? AND status = 'success'
+                ORDER BY finished_at DESC LIMIT 1
+            """, [stage, input_hash]).fetchone()
+        finally:
+            con.close()
+        return row[0] if row else None
+
+    def record(self, stage, input_hash, output_hash, status, attempts, started_at, error=None):
+        con = storage.connect(self.db_path)
+        try:
+            con.execute(PIPELINE_SCHEMA)
+            con.execute("INSERT INTO pipeline_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [self.run_key, stage, input_hash, output_hash, status, attempts, started_at, datetime.now(), error])
+        finally:
+            con.close()
+
+    def run_stage(self, name, input_hash, retries):
+        func = self.stages[name][0]
+        started_at = datetime.now()
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                # 시도마다 stage_metrics 기록 (pipeline.{단계} : 실패한 시도 포함)
+                with telemetry.measure(f"pipeline.{name}"):
+                    output_hash = func()
+                print(f"[pipeline] {name} 완료 ({time.perf_counter() - start:.2f}s)")
+                self.record(name, input_hash, output_hash, 'success', attempt + 1, started_at)
+                return output_hash
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"[pipeline] {name} 실패 {attempt + 1}/{retries + 1} : {error}")
+                if attempt == retries:
+                    self.record(name, input_hash, None, 'failed', attempt + 1, started_at, traceback.format_exc())
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def run(self, max_workers=MAX_WORKERS, retries=RETRIES, force=()):
+        outputs, status = {}, {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(status) < len(self.stages):
+                for name, (_, deps, params, volatile) in self.stages.items():
+                    if name in status or name in running.values():
+                        continue
+                    # 선행 단계 실패 -> 실행하지 않음
+                    if any(status.get(dep) in ('failed', 'blocked') for dep in deps):
+                        status[name] = 'blocked'
+                        print(f"[pipeline] {name} 건너뜀 (선행 단계 실패)")
+                        continue
+                    if not all(dep in outputs for dep in deps):
+                        continue
+
+                    # 입력 = 단계 이름 + 파라미터 + 선행 단계 출력
+                    input_hash = fingerprint(name, params, [outputs[dep] for dep in deps])
+                    cached = None if (volatile or name in force) else self.last_success(name, input_hash)
+                    if cached is not None:
+                        outputs[name], status[name] = cached, 'skipped'
+                        print(f"[pipeline] {name} 입력 변경 없음 -> 건너뜀")
+                        continue
+
+                    running[executor.submit(self.run_stage, name, input_hash, retries)] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name], status[name] = future.result(), 'success'
+                    except Exception:
+                        status[name] = 'failed'
+
+        return status
@@ -0,0 +1,139 @@
+import sys
+import pandas as pd
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+import trading_calendar
+
+# -----------------------------------
+# 설정: 로컬 주가(OHLCV) 저장소
+# -----------------------------------
+TICKER = "005930.KS"    # 삼성전자
+OHLCV_COLS = ['open', 'high', 'low', 'close', 'volume']
+
+PRICE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS prices (
+        ticker VARCHAR,
+        date VARCHAR,
+        open DOUBLE,
+        high DOUBLE,
+        low DOUBLE,
+        close DOUBLE,
+        volume DOUBLE,
+        PRIMARY KEY (ticker, date)
+    );
+    -- 휴장일 또는 조회했지만 거래 데이터가 없었던 날 : 다시 요청하지 않음
+    CREATE TABLE IF NOT EXISTS non_trading_days (
+        ticker VARCHAR,
+        date VARCHAR,
+        PRIMARY KEY (ticker, date)
+    );
+"""
+
+# -----------------------------------
+# 주가 provider : fetch(ticker, start, end) -> DataFrame(date, open, high, low, close, volume)
+# (start ~ end 양 끝 포함, 거래일 행만 반환)
+# -----------------------------------
+class PriceProvider(ABC) :
+    @abstractmethod
+    def fetch(self, ticker, start, end) :
+        ...
+
+class YFinanceProvider(PriceProvider) :
+    def fetch(self, ticker, start, end) :
+        import yfinance as yf
+
+        # yfinance는 end 날짜를 포함하지 않으므로 다음 날을 end 날짜로 설정
+        next_date = (datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        fetched = yf.Ticker(ticker).history(start=start, end=next_date, auto_adjust=False)
+        if fetched.empty :
+            return pd.DataFrame(columns=['date'] + OHLCV_COLS)
+
+        fetched = fetched.reset_index()
+        fetched.columns = fetched.columns.str.lower()
+        fetched['date'] = pd.to_datetime(fetched['date']).dt.date.astype(str)
+        return fetched[['date'] + OHLCV_COLS]
+
+def missing_ranges(dates) :
+    # 정렬된 날짜 문자열 -> 연속 구간 [(start, end), ...]
+    ranges = []
+    for d in dates :
+        day = datetime.strptime(d, '%Y-%m-%d')
+        if ranges and day - datetime.strptime(ranges[-1][1], '%Y-%m-%d') == timedelta(days=1) :
+            ranges[-1][1] = d
+        else :
+            ranges.append([d, d])
+    return [tuple(r) for r in ranges]
+
+# -----------------------------------
+# 기간 주가 조회 : 저장소에 없는 날짜 구간만 provider에 요청
+# -----------------------------------
+def get_prices(con, start, end, ticker=TICKER, provider=None, today=None) :
+    """ start ~ end 모든 날짜 기준 OHLCV (거래가 없는 날은 NaN) """
+    con.execute(PRICE_SCHEMA)
+    today = today or datetime.today().strftime('%Y-%m-%d')
+    dates = pd.date_range(start, end).strftime('%Y-%m-%d').tolist()
+
+    # 오늘 이후 날짜는 장 마감 전일 수 있으므로 항상 다시 조회
+    known = set(con.execute("""
+        SELECT date FROM prices WHERE ticker = ? AND date BETWEEN ? AND ? AND date < ?
+        UNION
+        SELECT date FROM non_trading_days WHERE ticker = ? AND date BETWEEN ? AND ?
+    """, [ticker, start, end, today, ticker, start, end]).fetchdf()['date'])
+
+    # KRX 휴장일(주말, 공휴일) -> 요청 없이 비거래일 처리
+    trading = dict(zip(dates, trading_calendar.is_trading_day(dates)))
+    holidays = [d for d in dates if d not in known and not trading[d]]
+    missing = [d for d in dates if d not in known and trading[d]]
+
+    new_rows, empty_days = [], list(holidays)
+    provider = provider or YFinanceProvider()
+    for range_start, range_end in missing_ranges(missing) :
+        fetched = provider.fetch(ticker, range_start, range_end)
+        new_rows.append(fetched)
+
+        # 조회했는데 데이터가 없는 지난 거래일 (데이터 제공처 누락)
+        fetched_dates = set(fetched['date'])
+        empty_days += [d for d in pd.date_range(range_start, range_end).strftime('%Y-%m-%d')
+                       if d not in fetched_dates and d < today]
+
+    if missing :
+        print(f"주가 조회 : {len(missing)}일 ({len(missing_ranges(missing))}구간), 저장소 사용 : {len(known)}일")
+
+    con.execute("BEGIN TRANSACTION")
+    try :
+        if new_rows :
+            fetched = pd.concat(new_rows, ignore_index=True)
+            fetched.insert(0, 'ticker', ticker)
+            con.register("fetched_prices", fetched)
+            con.execute("INSERT OR REPLACE INTO prices BY NAME SELECT * FROM fetched_prices")
+            con.unregister("fetched_prices")
+        if empty_days :
+            con.executemany("INSERT OR IGNORE INTO non_trading_days VALUES (?, ?)", [[ticker, d] for d in empty_days])
+        con.execute("COMMIT")
+    except Exception :
+        con.execute("ROLLBACK")
+        raise
+
+    return load_prices(con, start, end, ticker)
+
+def load_prices(con, start, end, ticker=TICKER) :
+    """ 저장소에 있는 주가만 조회 (요청 X), 기간 내 모든 날짜 기준 정렬, 주말/공휴일은 NaN """
+    con.execute(PRICE_SCHEMA)
+    hist = con.execute(f"""
+        SELECT date, {', '.join(OHLCV_COLS)} FROM prices
+        WHERE ticker = ? AND date BETWEEN ? AND ?
+    """, [ticker, start, end]).fetchdf()
+
+    dates = pd.date_range(start, end).strftime('%Y-%m-%d').tolist()
+    return pd.DataFrame({'date' : dates}).merge(hist, on='date', how='left')
+
+
+if __name__ == "__main__" :
+    # 과거 주가 일괄 적재 (노트북에서 재다운로드 대신 prices 테이블 사용)
+    # python prices.py 2021-01-01 2025-05-20
+    import storage
+    con = storage.connect()
+    prices = get_prices(con, sys.argv[1], sys.argv[2])
+    con.close()
+    print(f"{sys.argv[1]} ~ {sys.argv[2]} : 거래일 {prices['close'].notna().sum()}일")
@@ -1,9 +1,22 @@
 import os
+import sys
+import json
+import time
+import argparse
+import threading
 import joblib
 import duckdb
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+from scipy.stats import rankdata
+from sklearn.metrics import accuracy_score, roc_auc_score
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import storage
+import telemetry
+from features import load_features
 
 # -----------------------------------
 # 설정: 모델, 윈도우, 피처
@@ -11,64 +24,138 @@ from datetime import datetime
 models = ['lightgbm', 'xgboost', 'randomforest', 'decisiontree', 'gradientboosting']
 windows = [5, 15, 30]
 feature_cols = ['news_count', 'avg_negative', 'avg_neutral', 'avg_positive', 'open', 'high', 'low', 'close', 'volume']
+MODEL_DIR = "models"
+PORT = 8000
+ROLLING_DAYS = 60   # 백테스트 rolling accuracy / ROC-AUC 구간 (label 있는 날 기준)
+
+BACKTEST_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS backtest (
+        date VARCHAR,
+        model VARCHAR,
+        "window" INTEGER,
+        probability DOUBLE,
+        prediction INTEGER,
+        actual INTEGER,
+        rolling_accuracy DOUBLE,
+        rolling_auc DOUBLE,
+        PRIMARY KEY (date, model, "window")
+    )
+"""
+
+# -----------------------------------
+# 윈도우 입력 행렬 : 학습(sliding_window.generate_flatten_features)과 같은 기준
+# 날짜 t의 입력 = values[t - window_size : t] flatten (t 행은 포함하지 않음) -> label[t] 예측
+# 1회 예측 / 백테스트 모두 이 함수로 생성
+# -----------------------------------
+def window_matrix(values, window_size):
+    # j번째 행 = 날짜 j + window_size의 입력 (values[j : j + window_size]), 복사 없음
+    n_rows = max(len(values) - window_size, 0)
+    return as_strided(values, shape=(n_rows, window_size * values.shape[1]),
+                      strides=(values.strides[0], values.strides[1]), writeable=False)
 
 # -----------------------------------
-# 오늘 데이터의 입력 피처 생성 함수
+# 예측 대상 날짜의 윈도우 입력 피처 : 윈도우별로 한 번만 생성해서 모든 모델이 공유
 # -----------------------------------
-def get_today_feature(df, window_size, feature_cols):
-    # 라벨이 NaN인 오늘 데이터 제외하고 window 확보
-    if len(df) < window_size:
-        print("Not enough data for window size", window_size)
-        return None
+def window_features(values, end_idx, windows):
+    # values : (n_rows, n_features) / end_idx 행 직전 window_size개 행 flatten
+    features = {}
+    for window_size in windows:
+        if end_idx < window_size:
+            print("Not enough data for window size", window_size)
+            continue
 
-    # 마지막 window_size 만큼 슬라이싱
-    feature_window = df.iloc[-window_size:][feature_cols]
-    if feature_window.isnull().any().any():
-        print("Missing values in feature window")
-        return None
+        feature_window = window_matrix(values, window_size)[end_idx - window_size]
+        if np.isnan(feature_window).any():
+            print("Missing values in feature window")
+            continue
 
-    # flatten
-    return feature_window.values.flatten().reshape(1, -1)
+        features[window_size] = feature_window.reshape(1, -1)
+    return features
 
 # -----------------------------------
-# 메인 실행
+# 모델 레지스트리 : 모든 모델 파일을 한 번만 로드해서 메모리에 유지
+# (학습으로 파일이 바뀌면 해당 모델만 다시 로드, DB가 바뀌면 데이터만 다시 로드)
 # -----------------------------------
-if __name__ == "__main__":
-    today = datetime.today()
-    date_name = today.strftime('%y%m%d')  # 예: 250507
-    db_path = f"{date_name}_sentiment_stock.duckdb"
+class ModelRegistry:
+    def __init__(self, model_dir=MODEL_DIR, db_path=storage.DB_PATH):
+        self.model_dir = model_dir
+        self.db_path = db_path
+        self.models = {}        # (model_name, window) -> (mtime, model)
+        self.df = None
+        self.values = None
+        self.db_mtime = None
+        self.lock = threading.Lock()
 
-    # DB에서 데이터 불러오기
-    con = duckdb.connect(db_path)
-    df = con.execute("SELECT * FROM merged_data ORDER BY date").fetchdf()
+    def load_models(self):
+        for model_name in models:
+            for window in windows:
+                model_path = os.path.join(self.model_dir, f"{model_name}_window{window}.pkl")
+                if not os.path.exists(model_path):
+                    print(f"모델 파일 없음: {model_path}")
+                    self.models.pop((model_name, window), None)
+                    continue
 
-    # 뉴스 원문 컬럼 제거 (숫자 형태 컬럼 제외)
-    cols_to_remove = [col for col in df.columns if col.isdigit()]
-    df = df.drop(columns=cols_to_remove)
+                mtime = os.path.getmtime(model_path)
+                cached = self.models.get((model_name, window))
+                if cached is None or cached[0] != mtime:
+                    self.models[(model_name, window)] = (mtime, joblib.load(model_path))
 
-    # 오늘 데이터 (label == NaN) 기준으로 예측
-    today_row = df[df['label'].isna()].copy()
-    if today_row.empty:
-        print("오늘 예측할 데이터가 없습니다.")
-        exit()
+    def load_data(self):
+        mtime = os.path.getmtime(self.db_path)
+        if mtime == self.db_mtime:
+            return
 
-    print("오늘 날짜:", today_row['date'].values[0])
+        try:
+            con = storage.connect(self.db_path, read_only=True)
+        except duckdb.IOException as e:
+            # 다른 프로세스가 쓰기 중 (학습 / 수집) -> 이전에 로드한 데이터로 계속 예측, 다음 요청에서 다시 시도
+            if self.df is None:
+                raise
+            print(f"DB 잠김, 이전 데이터로 예측 : {e}")
+            return
+        df = load_features(con)     # merged_data + 파생 피처 (기사 원문은 로드하지 않음)
+        con.close()
 
-    predictions = []
-    for model_name in models:
-        for window in windows:
-            model_path = f"models/{model_name}_window{window}.pkl"
-            if not os.path.exists(model_path):
-                print(f"모델 파일 없음: {model_path}")
-                continue
+        self.df = df
+        self.values = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float64))
+        self.db_mtime = mtime
 
-            X_today = get_today_feature(df, window, feature_cols)
-            if X_today is None:
-                continue
+    def refresh(self):
+        with self.lock:
+            self.load_data()
+            self.load_models()
+
+    def target_index(self, date=None):
+        if date is None:
+            # 가장 최근 label == NaN 행 기준으로 예측
+            # (금요일 / 주말 / 휴일 전날은 다음 거래일 종가 전까지 모두 NaN -> 첫 행이 아니라 마지막 행)
+            today_rows = np.flatnonzero(self.df['label'].isna().to_numpy())
+            if not len(today_rows):
+                return None
+            return int(today_rows[-1])
+
+        matched = np.flatnonzero(self.df['date'].to_numpy() == date)
+        return int(matched[0]) if len(matched) else None
 
-            model = joblib.load(model_path)
-            prob = model.predict_proba(X_today)[0][1]  # 클래스 1 (상승) 확률
+    def predict(self, date=None):
+        # 요청 스레드마다 같은 시점의 데이터/모델 사용
+        with self.lock:
+            self.load_data()
+            self.load_models()
+            idx = self.target_index(date)
+            df, values, loaded = self.df, self.values, list(self.models.items())
 
+        if idx is None:
+            return None, []
+
+        features = window_features(values, idx, windows)
+
+        predictions = []
+        for (model_name, window), (_, model) in loaded:
+            if window not in features:
+                continue
+
+            prob = float(model.predict_proba(features[window])[0][1])  # 클래스 1 (상승) 확률
             predictions.append({
                 'model': model_name,
                 'window': window,
@@ -76,9 +163,217 @@ if __name__ == "__main__":
                 'prediction': int(prob > 0.5)
             })
 
+        return df['date'].iloc[idx], predictions
+
+# -----------------------------------
+# 백테스트 : 기간 내 모든 날짜의 윈도우 행렬을 한 번에 만들고 모델별 predict_proba 1회 호출
+# -----------------------------------
+def rolling_auc(probability, actual, n):
+    # 길이 n 구간별 ROC-AUC (순위합 공식, 구간 안에 한 클래스만 있으면 NaN)
+    auc = np.full(len(probability), np.nan)
+    if len(probability) < n:
+        return auc
+
+    probs = sliding_window_view(probability, n)
+    labels = sliding_window_view(actual, n).astype(bool)
+    ranks = rankdata(probs, axis=1)
+    n_pos = labels.sum(axis=1)
+    n_neg = n - n_pos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        auc[n - 1:] = ((ranks * labels).sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+    return auc
+
+def add_rolling_metrics(result, n=ROLLING_DAYS):
+    result = result.sort_values(['model', 'window', 'date']).reset_index(drop=True)
+    result['rolling_accuracy'] = np.nan
+    result['rolling_auc'] = np.nan
+
+    for _, group in result[result['actual'].notna()].groupby(['model', 'window']):
+        actual = group['actual'].to_numpy(dtype=np.int64)
+        correct = pd.Series((group['prediction'].to_numpy() == actual).astype(float), index=group.index)
+        result.loc[group.index, 'rolling_accuracy'] = correct.rolling(n, min_periods=n).mean()
+        result.loc[group.index, 'rolling_auc'] = rolling_auc(group['probability'].to_numpy(), actual, n)
+
+    return result
+
+def backtest(registry, start=None, end=None, n=ROLLING_DAYS):
+    registry.refresh()
+    df, values = registry.df, registry.values
+    dates = df['date'].to_numpy()
+    actual = df['label'].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # 예측 대상 날짜 범위
+    in_range = np.ones(len(df), dtype=bool)
+    if start:
+        in_range &= dates >= start
+    if end:
+        in_range &= dates <= end
+
+    results = []
+    for window in windows:
+        # 윈도우 다음 행이 예측 날짜 (학습 / 1회 예측과 같은 기준)
+        X = window_matrix(values, window)
+        target = np.arange(window, len(df))
+        keep = in_range[target] & ~np.isnan(X).any(axis=1)
+        X, target = X[keep], target[keep]
+        if not len(target):
+            continue
+
+        for model_name in models:
+            if (model_name, window) not in registry.models:
+                continue
+            model = registry.models[(model_name, window)][1]
+
+            probability = model.predict_proba(X)[:, 1]   # 클래스 1 (상승) 확률
+            results.append(pd.DataFrame({
+                'date': dates[target],
+                'model': model_name,
+                'window': window,
+                'probability': probability,
+                'prediction': (probability > 0.5).astype(int),
+                'actual': pd.array(actual[target], dtype='Int64'),
+            }))
+
+    if not results:
+        return pd.DataFrame()
+    return add_rolling_metrics(pd.concat(results, ignore_index=True), n)
+
+def save_backtest(con, result):
+    con.execute(BACKTEST_SCHEMA)
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.register("backtest_df", result)
+        con.execute("DELETE FROM backtest WHERE date BETWEEN ? AND ?", [result['date'].min(), result['date'].max()])
+        con.execute("INSERT INTO backtest BY NAME SELECT * FROM backtest_df")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("backtest_df")
+
+def print_backtest_summary(result):
+    print("\n--- 백테스트 결과 (label 있는 날 기준) ---")
+    labeled = result[result['actual'].notna()]
+    for (model_name, window), group in labeled.groupby(['model', 'window']):
+        actual = group['actual'].to_numpy(dtype=np.int64)
+        auc = roc_auc_score(actual, group['probability']) if len(set(actual)) == 2 else float('nan')
+        print(f"[{model_name:^17}] 윈도우={window:>2}일 → {group['date'].min()} ~ {group['date'].max()} "
+              f"({len(group)}일) accuracy={accuracy_score(actual, group['prediction']):.4f} AUC={auc:.4f}")
+
+def print_predictions(predictions):
     if predictions:
         print("\n--- 오늘 종가 예측 결과 ---")
         for pred in predictions:
             print(f"[{pred['model']:^17}] 윈도우={pred['window']:>2}일 → 상승 확률={pred['rise_probability']:.4f} → 예측: {'상승' if pred['prediction']==1 else '하락/유지'}")
     else:
-        print("모델 예측 불가능 (데이터 부족 또는 모델 누락)")
\ No newline at end of file
+        print("모델 예측 불가능 (데이터 부족 또는 모델 누락)")
+
+# -----------------------------------
+# 예측 서버 : GET /predict?date=YYYY-MM-DD (date 생략 시 오늘), GET /health
+# -----------------------------------
+def make_handler(registry):
+    class PredictHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/health':
+                self.send_json(200, {'models': len(registry.models), 'rows': len(registry.df)})
+                return
+            if url.path != '/predict':
+                self.send_json(404, {'error': 'not found'})
+                return
+
+            start = time.perf_counter()
+            date = parse_qs(url.query).get('date', [None])[0]
+            try:
+                target_date, predictions = registry.predict(date)
+            except Exception as e:
+                self.send_json(500, {'error': str(e)})
+                return
+
+            if target_date is None:
+                self.send_json(404, {'error': f"예측할 데이터가 없습니다: {date or '오늘'}"})
+                return
+
+            self.send_json(200, {
+                'date': target_date,
+                'predictions': predictions,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictHandler
+
+def serve(registry, port=PORT):
+    registry.refresh()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(registry))
+    print(f"예측 서버 시작: http://127.0.0.1:{port}/predict (모델 {len(registry.models)}개)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+# -----------------------------------
+# 메인 실행
+# -----------------------------------
+if __name__ == "__main__":
+    # 1회 예측 : python real_predict.py [--date 2025-05-20]
+    # 예측 서버 : python real_predict.py --serve --port 8000
+    # 백테스트 : python real_predict.py --backtest [--start --end --rolling 60]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--date')
+    parser.add_argument('--serve', action='store_true')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backtest', action='store_true')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--rolling', type=int, default=ROLLING_DAYS)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.serve:
+        serve(registry, args.port)
+        sys.exit()
+
+    if args.backtest:
+        # 백테스트 : python real_predict.py --backtest [--start 2024-01-01 --end 2025-05-20]
+        start = time.perf_counter()
+        with telemetry.measure('backtest'):
+            result = backtest(registry, args.start, args.end, args.rolling)
+            telemetry.count('rows', len(result))
+        if result.empty:
+            print("백테스트할 데이터가 없습니다.")
+            sys.exit()
+
+        with telemetry.measure('save_backtest'):
+            con = storage.connect()
+            save_backtest(con, result)
+            con.close()
+            telemetry.count('rows', len(result))
+        print_backtest_summary(result)
+        print(f"\n{len(result)}행 → backtest 테이블 저장 ({time.perf_counter() - start:.2f}s)")
+        sys.exit()
+
+    # 모델 / 데이터 로드 포함 1회 예측 (stage_metrics : real_predict)
+    with telemetry.measure('real_predict'):
+        target_date, predictions = registry.predict(args.date)
+        telemetry.count('models', len(registry.models))
+        telemetry.count('predictions', len(predictions))
+    if target_date is None:
+        print("오늘 예측할 데이터가 없습니다.")
+        sys.exit()
+
+    print("오늘 날짜:", target_date)
+    print_predictions(predictions)
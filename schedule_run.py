@@ -1,29 +1,131 @@
-import schedule
+import os
 import time
-import subprocess
+import argparse
+import schedule
 from datetime import datetime
 
-def run_pipeline():
-    today = datetime.today().strftime('%Y-%m-%d')
-    print(f"[{today}] 실행 시작")
+import storage
+import update_today_data
+import sliding_window
+import sentiment_engine
+import real_predict
+import telemetry
+from features import refresh_features, load_features
+from pipeline import Pipeline, fingerprint, frame_fingerprint
 
+# -----------------------------------
+# 학습 / 예측 단계 (수집 단계는 update_today_data.py)
+# -----------------------------------
+def features_stage(start):
+    con = storage.connect()
     try:
-        # 1. 데이터 수집 및 DuckDB 저장
-        subprocess.run(["python3", "update_today_data.py"], check=True)
+        con.execute("BEGIN TRANSACTION")
+        try:
+            refresh_features(con, since=start)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        stored = con.execute("SELECT * FROM features WHERE date >= ? ORDER BY date", [start]).fetchdf()
+    finally:
+        con.close()
+    return frame_fingerprint(stored)
+
+def train_stage(model_dir="models"):
+    con = storage.connect()
+    try:
+        runs = sliding_window.incremental_train(con, load_features(con), model_dir)
+    finally:
+        con.close()
+    telemetry.count('models', sum(run['mode'] != 'skip' for run in runs))
+
+    # 모델 파일이 바뀌었는지 (skip만 있었다면 predict도 건너뜀)
+    files = sorted(f for f in os.listdir(model_dir) if f.endswith('.pkl'))
+    return fingerprint([(f, os.path.getmtime(os.path.join(model_dir, f))) for f in files])
+
+# 스케줄러 프로세스에서 모델을 한 번만 로드 (이후 실행은 바뀐 모델 파일 / 데이터만 다시 로드)
+registry = real_predict.ModelRegistry()
+
+def predict_stage():
+    # 다른 단계의 DB 연결이 모두 닫힌 뒤 실행 (read_only 연결)
+    registry.refresh()
+    date, predictions = registry.predict()
+    if date is None:
+        print("예측할 날짜(label이 없는 행)가 없습니다.")
+        return fingerprint(None)
+
+    print(f"[{date}] 예측 결과")
+    real_predict.print_predictions(predictions)
+    return fingerprint(date, predictions)
+
+# -----------------------------------
+# 단계 DAG
+# crawl -> sentiment ┐
+# price ─────────────┴-> merge -> features -> train -> predict (features도 predict 입력)
+# (crawl+sentiment와 price는 동시에 실행, 입력이 바뀌지 않은 단계는 건너뜀)
+# -----------------------------------
+def build_pipeline(start, end):
+    today = datetime.today().strftime('%Y-%m-%d')
+    pipeline = Pipeline(f"{start}~{end}")
+
+    # 오늘이 포함된 기간은 기사/주가가 계속 바뀌므로 항상 다시 수집
+    live = end >= today
+    pipeline.add('crawl', lambda: update_today_data.crawl_stage(start, end), params=[start, end], volatile=live)
+    pipeline.add('price', lambda: update_today_data.price_stage(start, end), params=[start, end], volatile=live)
+    # 감성 분석 백엔드가 바뀌면 같은 기간도 다시 분석
+    pipeline.add('sentiment', lambda: update_today_data.sentiment_stage(start, end), deps=['crawl'],
+                 params=[start, end, sentiment_engine.SENTIMENT_BACKEND])
+    pipeline.add('merge', lambda: update_today_data.merge_stage(start, end), deps=['sentiment', 'price'], params=[start, end])
+    pipeline.add('features', lambda: features_stage(start), deps=['merge'], params=[start])
+    pipeline.add('train', train_stage, deps=['features'])
+    pipeline.add('predict', predict_stage, deps=['features', 'train'])
+    return pipeline
+
+def run_pipeline(start=None, end=None, force=()):
+    today = datetime.today().strftime('%Y-%m-%d')
+    start = start or today
+    end = end or start
+    print(f"[{today}] 실행 시작 ({start} ~ {end})")
 
-        # 2. 슬라이딩 윈도우 모델링 실행
-        subprocess.run(["python3", "sliding_window.py"], check=True)
+    telemetry.new_run()
+    update_today_data.reset_stage_times()
+    status = build_pipeline(start, end).run(force=force)
+    update_today_data.print_stage_times()
+    telemetry.flush()
 
+    failed = [name for name, state in status.items() if state in ('failed', 'blocked')]
+    if failed:
+        # 다음 실행 시 성공한 단계는 입력이 같으므로 건너뛰고 실패한 단계부터 다시 실행
+        print(f"[{today}] 실행 중 오류 발생: {', '.join(failed)}")
+    else:
         print(f"[{today}] 전체 파이프라인 완료")
+    return status
 
-    except subprocess.CalledProcessError as e:
-        print(f"[{today}] 실행 중 오류 발생: {e}")
 
-# 매일 23:30 실행
-schedule.every().day.at("23:30").do(run_pipeline)
+if __name__ == "__main__":
+    # 스케줄러 : python3 schedule_run.py
+    # 즉시 1회 실행 : python3 schedule_run.py --now [--start 2025-05-01 --end 2025-05-07]
+    # 특정 단계 강제 재실행 : python3 schedule_run.py --now --force train
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--now', action='store_true')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--force', nargs='*', default=[], help="입력이 같아도 다시 실행할 단계")
+    parser.add_argument('--sentiment-backend', choices=sentiment_engine.BACKENDS, default=sentiment_engine.SENTIMENT_BACKEND,
+                        help="감성 분석 백엔드 (기본 : SENTIMENT_BACKEND 또는 fp32)")
+    parser.add_argument('--sentiment-threads', type=int, default=sentiment_engine.SENTIMENT_THREADS,
+                        help="감성 분석 torch 스레드 수 (기본 : SENTIMENT_THREADS)")
+    args = parser.parse_args()
+    sentiment_engine.SENTIMENT_BACKEND = args.sentiment_backend
+    sentiment_engine.SENTIMENT_THREADS = args.sentiment_threads
 
-print("스케줄러 시작됨: 매일 23:30에 자동 실행됩니다.")
-while True:
-    schedule.run_pending()
-    time.sleep(1)
+    if args.now:
+        run_pipeline(args.start, args.end, force=args.force)
+    else:
+        # 매일 23:30 실행 (모델 / 라이브러리는 프로세스 안에서 한 번만 로드)
+        schedule.every().day.at("23:30").do(run_pipeline)
 
+        print("스케줄러 시작됨: 매일 23:30에 자동 실행됩니다.")
+        while True:
+            schedule.run_pending()
+            time.sleep(1)
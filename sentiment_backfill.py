@@ -0,0 +1,115 @@
+import os
+import argparse
+import pandas as pd
+
+from tqdm import tqdm
+from multiprocessing import Pool
+from sentiment_engine import MODEL_NAME, BACKENDS, SentimentScorer, daily_sentiment
+import storage
+from storage import wide_to_articles
+
+# -----------------------------------
+# 설정: 샤드 저장 경로, 샤드당 날짜 수
+# -----------------------------------
+SHARD_DIR = "backfill_shards"
+CHUNK_DAYS = 20     # 한 샤드 파일에 담는 날짜 수 (재시작 시 최대 손실 단위)
+
+# -----------------------------------
+# 워커 초기화 : 워커별 모델 1회 로드 + torch 스레드 수 제한
+# -----------------------------------
+_scorer = None
+
+def init_worker(model_name, backend, num_threads):
+    global _scorer
+    # 워커 수 x 스레드 수가 코어 수를 넘지 않도록 inter-op은 1로 고정
+    _scorer = SentimentScorer(model_name, backend=backend, num_threads=num_threads, num_interop_threads=1)
+
+# -----------------------------------
+# 샤드 1개 감성 분석 -> 샤드 파일 저장
+# -----------------------------------
+def score_shard(args):
+    articles, dates, shard_dir = args
+    result = daily_sentiment(articles, dates, _scorer)
+
+    # 임시 파일에 쓴 뒤 rename -> 중간에 죽어도 완성된 샤드만 남음
+    first, last = result['date'].iloc[0], result['date'].iloc[-1]
+    path = os.path.join(shard_dir, f"shard_{first}_{last}.csv")
+    result.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+    return len(result)
+
+def load_shards(shard_dir):
+    files = sorted(f for f in os.listdir(shard_dir) if f.startswith("shard_") and f.endswith(".csv"))
+    if not files:
+        return pd.DataFrame(columns=['date'])
+    return pd.concat([pd.read_csv(os.path.join(shard_dir, f)) for f in files], ignore_index=True)
+
+# -----------------------------------
+# 샤드 병합 -> 일별 감성 테이블 (date, news_count, avg_*)
+# -----------------------------------
+def merge_shards(shard_dir):
+    merged = load_shards(shard_dir)
+    return merged.drop_duplicates('date', keep='last').sort_values('date').reset_index(drop=True)
+
+# -----------------------------------
+# 전체 backfill 실행
+# -----------------------------------
+def backfill(headlines_path, output_path=None, workers=None, model_name=MODEL_NAME, backend='fp32',
+             shard_dir=SHARD_DIR, chunk_days=CHUNK_DAYS, db_path=storage.DB_PATH):
+    headlines = pd.read_csv(headlines_path)
+    headlines = headlines.drop(columns=[col for col in headlines.columns if col.startswith('Unnamed')])
+    articles = wide_to_articles(headlines)
+    all_dates = sorted(headlines['date'])
+
+    # 이미 샤드 파일로 저장된 날짜는 건너뜀 (재시작 시 이어서 실행)
+    os.makedirs(shard_dir, exist_ok=True)
+    done_dates = set(load_shards(shard_dir)['date'])
+    todo = [date for date in all_dates if date not in done_dates]
+    print(f"전체 {len(all_dates)}일 중 완료 {len(all_dates) - len(todo)}일, 남은 날짜 {len(todo)}일")
+
+    if len(todo) > 0:
+        # 워커 수 x 워커당 torch 스레드 수 <= 코어 수
+        workers = workers or max(1, os.cpu_count() - 1)
+        num_threads = max(1, os.cpu_count() // workers)
+
+        chunks = []
+        for i in range(0, len(todo), chunk_days):
+            dates = todo[i:i + chunk_days]
+            chunks.append((articles[articles['date'].isin(dates)], dates, shard_dir))
+        with Pool(processes=workers, initializer=init_worker, initargs=(model_name, backend, num_threads)) as pool:
+            for _ in tqdm(pool.imap_unordered(score_shard, chunks), total=len(chunks)):
+                pass
+
+    merged = merge_shards(shard_dir)
+    merged['date'] = merged['date'].astype(str)
+
+    # 일별 감성 테이블 저장 + 이미 적재된 날짜의 merged_data 감성 컬럼 / 파생 피처 갱신
+    con = storage.connect(db_path)
+    try:
+        storage.save_daily_sentiment(con, merged)
+        updated = storage.apply_daily_sentiment(con, merged)
+    finally:
+        con.close()
+    print(f"{len(merged)}일 일별 감성 테이블 저장 완료 → {db_path} (merged_data {updated}일 갱신)")
+
+    if output_path:
+        merged.to_csv(output_path, index=False)
+        print(f"CSV 저장 → {output_path}")
+
+    return merged
+
+
+if __name__ == "__main__":
+    # python sentiment_backfill.py data/250520_headlines.csv --workers 4 [--output data/250520_sentiment_daily.csv]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('headlines')
+    parser.add_argument('--output', help="일별 감성 테이블 CSV도 저장 (선택)")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--backend', choices=BACKENDS, default='fp32')
+    parser.add_argument('--shard-dir', default=SHARD_DIR)
+    parser.add_argument('--chunk-days', type=int, default=CHUNK_DAYS)
+    args = parser.parse_args()
+
+    backfill(args.headlines, args.output, args.workers, args.model, args.backend, args.shard_dir, args.chunk_days)
@@ -0,0 +1,382 @@
+import os
+import sys
+import time
+import argparse
+import duckdb
+import numpy as np
+import pandas as pd
+import torch
+from torch.nn.functional import softmax
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from storage import article_hash, wide_to_articles
+
+# -----------------------------------
+# 설정: 감성 분석 모델
+# -----------------------------------
+MODEL_NAME = "snunlp/KR-FinBert-SC"
+LABELS = ['negative', 'neutral', 'positive']   # 모델 출력 순서 (부정/중립/긍정)
+NEUTRAL_VECTOR = [0.0, 1.0, 0.0]               # 뉴스가 하나도 없는 날의 기본값
+
+BACKENDS = ['fp32', 'int8']                    # fp32 : 기본 / int8 : Linear 레이어 동적 양자화
+SAMPLE_PATH = "data/sentiment_sample.csv"      # 백엔드 정확도 비교용 고정 기사 샘플
+MAX_PROB_DELTA = 0.05                          # 백엔드 통과 기준 : fp32 대비 최대 확률 차이
+MIN_LABEL_AGREEMENT = 0.98                     # 백엔드 통과 기준 : fp32 대비 최소 라벨 일치율
+
+# 수집 파이프라인(update_today_data.py / schedule_run.py)의 기본 분석기 설정
+# ex) SENTIMENT_BACKEND=int8 SENTIMENT_THREADS=4 python schedule_run.py
+SENTIMENT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "fp32")
+SENTIMENT_THREADS = int(os.environ["SENTIMENT_THREADS"]) if os.environ.get("SENTIMENT_THREADS") else None
+
+CACHE_DB_PATH = "sentiment_cache.duckdb"       # 감성확률 캐시 DB
+CACHE_MAX_ENTRIES = 500_000                    # 캐시 최대 항목 수 (초과 시 LRU 삭제)
+CACHE_EVICT_RATIO = 0.9                        # 초과 시 최대 항목 수의 90%까지 삭제
+
+# -----------------------------------
+# 감성확률 캐시 : 기사 원문 해시 + 모델명/리비전 -> 부정/중립/긍정 확률
+# -----------------------------------
+class SentimentCache:
+    def __init__(self, db_path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.con = duckdb.connect(db_path)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS sentiment_cache (
+                hash VARCHAR,
+                model VARCHAR,
+                negative DOUBLE,
+                neutral DOUBLE,
+                positive DOUBLE,
+                last_used TIMESTAMP DEFAULT current_timestamp,
+                PRIMARY KEY (hash, model)
+            )
+        """)
+        # LRU 순서 : 저장 / 사용 순으로 증가하는 번호 (같은 배치 안에서도 순서가 정해지도록)
+        self.con.execute("ALTER TABLE sentiment_cache ADD COLUMN IF NOT EXISTS seq BIGINT DEFAULT 0")
+        self.touched = {}       # 조회 hit (hash, model) -> 사용 순서, evict / close 때 한 번에 반영
+
+    def lookup(self, hashes, model_tag):
+        """ 해시 리스트 일괄 조회 -> {hash: [neg, neu, pos]} (hit만 포함) """
+        if not hashes:
+            return {}
+        self.con.register("lookup_keys", pd.DataFrame({'hash': list(set(hashes))}))
+        rows = self.con.execute("""
+            SELECT c.hash, c.negative, c.neutral, c.positive
+            FROM sentiment_cache c JOIN lookup_keys k USING (hash)
+            WHERE c.model = ?
+        """, [model_tag]).fetchall()
+        self.con.unregister("lookup_keys")
+
+        # hit 항목 사용 기록은 메모리에만 (조회마다 UPDATE X)
+        for h, *_ in rows:
+            self.touched.pop((h, model_tag), None)
+            self.touched[(h, model_tag)] = None
+        return {h: [neg, neu, pos] for h, neg, neu, pos in rows}
+
+    def next_seq(self):
+        return self.con.execute("SELECT coalesce(max(seq), 0) + 1 FROM sentiment_cache").fetchone()[0]
+
+    def flush_touched(self):
+        # 조회 hit 순서대로 seq / last_used 일괄 갱신 (UPDATE 1회)
+        if not self.touched:
+            return
+        base = self.next_seq()
+        touched = pd.DataFrame(list(self.touched), columns=['hash', 'model'])
+        touched['seq'] = base + np.arange(len(touched))
+        self.con.register("touched_df", touched)
+        self.con.execute("""
+            UPDATE sentiment_cache SET seq = t.seq, last_used = current_timestamp
+            FROM touched_df t WHERE sentiment_cache.hash = t.hash AND sentiment_cache.model = t.model
+        """)
+        self.con.unregister("touched_df")
+        self.touched.clear()
+
+    def store(self, hashes, model_tag, probs):
+        if not hashes:
+            return
+        new_rows = pd.DataFrame({
+            'hash': hashes,
+            'model': model_tag,
+            'negative': probs[:, 0].astype(float),
+            'neutral': probs[:, 1].astype(float),
+            'positive': probs[:, 2].astype(float),
+        }).drop_duplicates('hash', keep='last')
+        new_rows['seq'] = self.next_seq() + np.arange(len(new_rows))     # 배치 안에서는 입력 순서
+        self.con.register("new_rows", new_rows)
+        self.con.execute("""
+            INSERT OR REPLACE INTO sentiment_cache (hash, model, negative, neutral, positive, seq)
+            SELECT hash, model, negative, neutral, positive, seq FROM new_rows
+        """)
+        self.con.unregister("new_rows")
+        self.evict()
+
+    def evict(self):
+        # 최대 항목 수 이하면 정렬 없이 종료 (store마다 호출되므로 전체 정렬은 초과했을 때만)
+        n_entries = self.con.execute("SELECT count(*) FROM sentiment_cache").fetchone()[0]
+        if n_entries <= self.max_entries:
+            return
+
+        # 초과 시 가장 오래 사용되지 않은 항목부터 삭제, 최대의 90%까지 줄여서 다음 페이지마다 다시 정렬하지 않음
+        self.flush_touched()
+        self.con.execute("""
+            DELETE FROM sentiment_cache WHERE (hash, model) IN (
+                SELECT (hash, model) FROM sentiment_cache
+                ORDER BY seq DESC
+                OFFSET ?
+            )
+        """, [int(self.max_entries * CACHE_EVICT_RATIO)])
+
+    def close(self):
+        self.flush_touched()
+        self.con.close()
+
+# -----------------------------------
+# CPU 추론 설정 : torch 스레드 수
+# -----------------------------------
+def configure_threads(num_threads=None, num_interop_threads=None):
+    # intra-op : 연산 하나(행렬곱 등)를 나눠 처리하는 스레드 수
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    # inter-op : 독립 연산을 동시에 실행하는 스레드 수 (첫 병렬 연산 이전에만 변경 가능)
+    if num_interop_threads:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            print(f"inter-op 스레드 수 변경 불가 (현재 {torch.get_num_interop_threads()}개 유지)")
+
+# -----------------------------------
+# 감성 분석기 : 모델을 프로세스당 한 번만 로드
+# -----------------------------------
+class SentimentScorer:
+    def __init__(self, model_name=MODEL_NAME, max_batch_tokens=8192, max_length=512, revision=None, cache=None,
+                 backend='fp32', num_threads=None, num_interop_threads=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
+
+        self.model_name = model_name
+        self.max_batch_tokens = max_batch_tokens
+        self.max_length = max_length
+        self.cache = cache
+        self.backend = backend
+        self.stats = {'hits': 0, 'misses': 0}
+
+        configure_threads(num_threads, num_interop_threads)
+
+        # tokenizer / 사전학습된 감성 분류 모델은 생성 시 한 번만 불러옴
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+
+        # 추론 모드
+        self.model.eval()
+
+        # int8 : Linear 레이어 가중치를 int8로 동적 양자화 (CPU 전용)
+        if backend == 'int8':
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        # 캐시 키에 포함할 모델 식별자 (모델명@리비전:백엔드)
+        revision = revision or getattr(self.model.config, '_commit_hash', None) or 'local'
+        self.model_tag = f"{model_name}@{revision}:{backend}"
+
+    def score(self, texts, max_batch_tokens=None):
+        """ "제목 ||| 본문" 문자열 리스트 -> (N, 3) 감성 확률 배열 (부정/중립/긍정) """
+        texts = list(texts)
+        if self.cache is None:
+            return self._score_batches(texts, max_batch_tokens)
+
+        # 캐시 일괄 조회 후 miss 기사만 모델 추론 (같은 기사는 한 번만 추론)
+        hashes = [article_hash(text) for text in texts]
+        cached = self.cache.lookup(hashes, self.model_tag)
+
+        miss = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached and h not in miss:
+                miss[h] = text
+
+        miss_probs = self._score_batches(list(miss.values()), max_batch_tokens)
+        self.cache.store(list(miss.keys()), self.model_tag, miss_probs)
+        cached.update(zip(miss.keys(), miss_probs.tolist()))
+
+        self.stats['hits'] += len(texts) - len(miss)
+        self.stats['misses'] += len(miss)
+
+        return np.asarray([cached[h] for h in hashes], dtype=np.float32).reshape(-1, len(LABELS))
+
+    def _score_batches(self, texts, max_batch_tokens=None):
+        max_batch_tokens = max_batch_tokens or self.max_batch_tokens
+        probs = np.zeros((len(texts), len(LABELS)), dtype=np.float32)
+        if not texts:
+            return probs
+
+        # padding 없이 전체 토크나이징 -> 토큰 길이 기준 정렬
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        lengths = np.array([len(ids) for ids in encoded['input_ids']])
+        order = np.argsort(lengths, kind='stable')
+
+        for batch_idx in self._length_buckets(lengths[order], max_batch_tokens):
+            idx = order[batch_idx]
+
+            # 버킷 내 최장 길이까지만 padding
+            features = [{key: encoded[key][i] for key in encoded.keys()} for i in idx]
+            inputs = self.tokenizer.pad(features, return_tensors="pt")
+
+            # 추론 모드에서 모델 실행 (기울기 미계산)
+            with torch.no_grad():
+                outputs = self.model(**inputs)
+
+            # softmax를 통해 확률값 벡터화 후 원래 순서 위치에 기록
+            probs[idx] = softmax(outputs.logits, dim=1).numpy()
+
+        return probs
+
+    @staticmethod
+    def _length_buckets(sorted_lengths, max_batch_tokens):
+        """ 오름차순 길이 배열 -> (배치 크기 x 최장 길이) <= max_batch_tokens 인 구간 slice 리스트 """
+        buckets, start = [], 0
+        for end in range(1, len(sorted_lengths) + 1):
+            # 정렬되어 있으므로 구간의 마지막 원소가 최장 길이
+            if end - start > 1 and (end - start) * sorted_lengths[end - 1] > max_batch_tokens:
+                buckets.append(slice(start, end - 1))
+                start = end - 1
+        buckets.append(slice(start, len(sorted_lengths)))
+        return buckets
+
+    def score_one(self, text: str):
+        """ 단일 기사 -> {'negative', 'neutral', 'positive'} 딕셔너리 """
+        probs = self.score([text])[0].tolist()
+        return dict(zip(LABELS, probs))
+
+
+# 프로세스 단위로 재사용되는 기본 분석기
+_scorer = None
+
+def get_scorer(cache_path=CACHE_DB_PATH, **kwargs):
+    global _scorer
+    if _scorer is None:
+        # 인자로 지정하지 않은 백엔드 / 스레드 수는 SENTIMENT_BACKEND / SENTIMENT_THREADS
+        kwargs.setdefault('backend', SENTIMENT_BACKEND)
+        if kwargs.get('num_threads') is None:
+            kwargs['num_threads'] = SENTIMENT_THREADS
+        cache = SentimentCache(cache_path) if cache_path else None
+        _scorer = SentimentScorer(cache=cache, **kwargs)
+    return _scorer
+
+# -----------------------------------
+# 일별 평균 감성확률 계산 (long 형식 articles : date, text)
+# -----------------------------------
+def daily_sentiment_stream(pages, dates, scorer=None):
+    """ 기사 묶음(페이지)이 도착하는 대로 감성 분석 -> (일별 평균 데이터프레임, 전체 기사 데이터프레임) """
+    scorer = scorer or get_scorer()
+
+    # 기사가 없는 날도 결과에 포함 (dates : 전체 날짜)
+    dates = sorted(set(dates))
+    date_index = pd.Index(dates)
+    sums = np.zeros((len(dates), len(LABELS)))
+    counts = np.zeros(len(dates), dtype=int)
+    hits, misses = scorer.stats['hits'], scorer.stats['misses']
+
+    collected = []
+    for page in pages:
+        collected.append(page)
+
+        # 빈 기사 / 기간 밖 기사 제외 후 배치 추론
+        day_ids = date_index.get_indexer(page['date'])
+        valid = (page['text'].fillna('').str.strip() != '').to_numpy() & (day_ids >= 0)
+        if not valid.any():
+            continue
+        probs = scorer.score(page['text'][valid].tolist())
+
+        # 날짜별 감성 벡터 합계 / 기사 수 누적
+        np.add.at(sums, day_ids[valid], probs)
+        np.add.at(counts, day_ids[valid], 1)
+
+    if scorer.cache is not None:
+        print(f"감성 캐시 hit : {scorer.stats['hits'] - hits}건 / miss : {scorer.stats['misses'] - misses}건")
+
+    avg = np.tile(NEUTRAL_VECTOR, (len(dates), 1))   # 뉴스가 없는 날 -> avg_neutral = 1.0
+    has_news = counts > 0
+    avg[has_news] = sums[has_news] / counts[has_news, None]
+
+    sentiment_df = pd.DataFrame({
+        'date': dates,
+        'news_count': counts,
+        'avg_negative': avg[:, 0].round(4),
+        'avg_neutral': avg[:, 1].round(4),
+        'avg_positive': avg[:, 2].round(4)
+    })
+    articles = pd.concat(collected, ignore_index=True) if collected else pd.DataFrame(columns=['date', 'text'])
+
+    return sentiment_df, articles
+
+def daily_sentiment(articles, dates=None, scorer=None):
+    # 기사가 없는 날도 결과에 포함하려면 dates로 전체 날짜 지정
+    dates = articles['date'] if dates is None else dates
+    return daily_sentiment_stream([articles], dates, scorer)[0]
+
+
+# -----------------------------------
+# 백엔드 비교 : fp32 대비 정확도 + 처리량 (articles/sec)
+# -----------------------------------
+def compare_backends(model_name=MODEL_NAME, sample_path=SAMPLE_PATH, num_threads=None, num_interop_threads=None,
+                     max_prob_delta=MAX_PROB_DELTA, min_label_agreement=MIN_LABEL_AGREEMENT):
+    # 백엔드별 처리량 + fp32 대비 확률 차이 / 라벨 일치율, 기준을 넘으면 passed=False
+    texts = pd.read_csv(sample_path)['text'].tolist()
+
+    results, probs = [], {}
+    for backend in BACKENDS:
+        scorer = SentimentScorer(model_name, backend=backend, num_threads=num_threads,
+                                 num_interop_threads=num_interop_threads)
+
+        start = time.perf_counter()
+        probs[backend] = scorer.score(texts)
+        elapsed = time.perf_counter() - start
+
+        base = probs['fp32']
+        max_abs_diff = float(np.abs(probs[backend] - base).max())
+        label_agreement = float((probs[backend].argmax(axis=1) == base.argmax(axis=1)).mean())
+        results.append({
+            'backend': backend,
+            'threads': torch.get_num_threads(),
+            'articles_per_sec': round(len(texts) / elapsed, 2),
+            'max_abs_diff': max_abs_diff,
+            'mean_abs_diff': float(np.abs(probs[backend] - base).mean()),
+            'label_agreement': label_agreement,
+            'passed': max_abs_diff <= max_prob_delta and label_agreement >= min_label_agreement
+        })
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    # headlines csv 일괄 감성 분석
+    # python sentiment_engine.py data/250520_headlines.csv data/250520_sentiment_daily.csv --backend int8 --threads 4
+    # 백엔드 정확도/처리량 비교
+    # python sentiment_engine.py --compare-backends --threads 4   (기준 미달 백엔드가 있으면 exit code 1)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input', nargs='?')
+    parser.add_argument('output', nargs='?')
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--backend', choices=BACKENDS, default=SENTIMENT_BACKEND)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--interop-threads', type=int)
+    parser.add_argument('--compare-backends', action='store_true')
+    parser.add_argument('--max-prob-delta', type=float, default=MAX_PROB_DELTA)
+    parser.add_argument('--min-label-agreement', type=float, default=MIN_LABEL_AGREEMENT)
+    args = parser.parse_args()
+
+    if args.compare_backends:
+        report = compare_backends(args.model, num_threads=args.threads, num_interop_threads=args.interop_threads,
+                                  max_prob_delta=args.max_prob_delta, min_label_agreement=args.min_label_agreement)
+        print(report.to_string(index=False))
+        failed = report.loc[~report['passed'], 'backend'].tolist()
+        if failed:
+            print(f"기준 미달 백엔드 : {', '.join(failed)} (최대 확률 차이 <= {args.max_prob_delta}, "
+                  f"라벨 일치율 >= {args.min_label_agreement})")
+            sys.exit(1)
+    else:
+        scorer = get_scorer(model_name=args.model, backend=args.backend, num_threads=args.threads,
+                            num_interop_threads=args.interop_threads)
+        headlines = pd.read_csv(args.input, index_col=0)
+        result = daily_sentiment(wide_to_articles(headlines), headlines['date'], scorer)
+        result.to_csv(args.output, index=False)
+        print(f"{len(result)}일 감성 분석 완료 → {args.output}")
@@ -1,18 +1,31 @@
 import os
-import duckdb
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
 import joblib
+import numpy as np
 import pandas as pd
 
 from tqdm import tqdm
 from datetime import datetime
 from multiprocessing import Pool
+from numpy.lib.stride_tricks import as_strided
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
+from sklearn.base import clone
+from threadpoolctl import threadpool_limits
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 
 from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
 
+import storage
+import telemetry
+from features import load_features
+
 
 # -----------------------------------
 # 설정: 모델, 윈도우, 피처
@@ -45,21 +58,32 @@ param_grid = {
 # 슬라이딩 윈도우 피처 생성
 # -----------------------------------
 def generate_flatten_features(df, window_size, feature_cols, label_col='label'):
-    X, y = [], []
-    for i in range(window_size, len(df)):
-        # 과거 window_size만큼의 구간을 잘라서 피처들을 flatten
-        features = df.iloc[i-window_size:i][feature_cols].values.flatten()
-
-        # 예측대상 : 윈도우 이후 날짜(t)의 label값
-        label = df.iloc[i][label_col]   
-        X.append(features)
-        y.append(label)
+    # (날짜 x 피처) 행렬을 C-contiguous로 확보
+    values = np.ascontiguousarray(df[feature_cols].to_numpy())
+    n_samples = max(len(values) - window_size, 0)
+    n_features = values.shape[1]
+
+    # 연속된 window_size개 행은 메모리상 연속 구간이므로, 시작점만 한 행씩 옮기는 strided view로
+    # 과거 window_size만큼의 구간을 flatten한 (n_samples, window_size * n_features) 행렬을 복사 없이 생성
+    X = as_strided(values, shape=(n_samples, window_size * n_features),
+                   strides=(values.strides[0], values.strides[1]), writeable=False)
+
+    # 예측대상 : 윈도우 이후 날짜(t)의 label값
+    y = df[label_col].to_numpy()[window_size:]
+
     return pd.DataFrame(X), pd.Series(y)
 
+def window_samples(df, window_size, feature_cols):
+    # label이 있는 샘플만 (오늘 행은 label = NULL) + 각 샘플의 label 날짜
+    X, y = generate_flatten_features(df, window_size, feature_cols)
+    labeled = y.notna().to_numpy()
+    dates = df['date'].to_numpy()[window_size:]
+    return X.to_numpy(dtype=np.float64)[labeled], y.to_numpy()[labeled].astype(np.int64), dates[labeled]
+
 # -----------------------------------
 # 모델 학습 및 평가
 # -----------------------------------
-def train_and_evaluate(model_name, X_train, X_test, y_train, y_test, params):
+def make_model(model_name, params, threads=None):
     if model_name == 'lightgbm':
         model = LGBMClassifier(**params)
     elif model_name == 'xgboost':
@@ -73,66 +97,667 @@ def train_and_evaluate(model_name, X_train, X_test, y_train, y_test, params):
     else:
         raise ValueError(f"Unsupported model: {model_name}")
 
+    # 병렬 워커 안에서는 모델 내부 스레드 수 제한 (워커 수 x 내부 스레드 <= 코어 수)
+    if threads and model_name in THREADED:
+        model.set_params(n_jobs=threads)
+    return model
+
+def train_and_evaluate(model_name, X_train, X_test, y_train, y_test, params, threads=None):
+    model = make_model(model_name, params, threads)
     model.fit(X_train, y_train)
     preds = model.predict(X_test)   # 클래스 예측
     probas = model.predict_proba(X_test)[:, 1]  # 확률 예측
 
-    return {
+    return model, {
         'accuracy': accuracy_score(y_test, preds),
         'f1': f1_score(y_test, preds),
         'roc_auc': roc_auc_score(y_test, probas)
     }
 
 # -----------------------------------
-# 단일 실험 실행
+# 윈도우별 피처 행렬 : 윈도우 크기당 1회 생성 후 memory-mapped 파일로 공유
+# (같은 윈도우 데이터인지 확인하기 위한 fingerprint도 함께 계산)
 # -----------------------------------
-def run_one(args):
-    df, model_name, window_size, param, feature_cols, date_name = args
-    # 피처셋 생성 (flatten 방식)
-    X, y = generate_flatten_features(df, window_size, feature_cols)
+def data_fingerprint(X, y, dates):
+    # 학습 데이터 내용(피처 값, label, label 날짜) 해시
+    digest = hashlib.sha256()
+    for array in (X, y, dates.astype(str)):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def build_window_matrices(df, windows, feature_cols, cache_dir):
+    window_paths, fingerprints = {}, {}
+    for window in windows:
+        X, y, dates = window_samples(df, window, feature_cols)
+        x_path = os.path.join(cache_dir, f"X_window{window}.npy")
+        y_path = os.path.join(cache_dir, f"y_window{window}.npy")
+        np.save(x_path, X)
+        np.save(y_path, y)
+        window_paths[window] = (x_path, y_path)
+        fingerprints[window] = {'data_hash': data_fingerprint(X, y, dates),
+                                'data_start': dates[0] if len(dates) else None,
+                                'data_end': dates[-1] if len(dates) else None,
+                                'dates': dates}     # fold 구간 날짜 기록용 (label 날짜)
+    return window_paths, fingerprints
+
+# 워커 프로세스별 윈도우 파일 경로 / 열린 memmap / 모델 내부 스레드 수
+_window_paths = {}
+_window_data = {}
+_worker_threads = None
+
+def init_worker(window_paths, threads=None):
+    global _window_paths, _worker_threads
+    _window_paths = window_paths
+    _window_data.clear()
+
+    # 워커마다 OpenMP / BLAS 스레드 제한 (None : 제한 없음, 단일 프로세스 실행)
+    _worker_threads = threads
+    if threads:
+        threadpool_limits(limits=threads)
+
+def load_window(window_size):
+    # 읽기 전용 memmap : 같은 윈도우를 쓰는 워커들은 OS page cache를 공유 (복사 없음)
+    if window_size not in _window_data:
+        x_path, y_path = _window_paths[window_size]
+        _window_data[window_size] = (np.load(x_path, mmap_mode='r'), np.load(y_path, mmap_mode='r'))
+    return _window_data[window_size]
 
-    # 레이블이 단일값(예 : 전부 0)이면 평가 의미 없음 -> skip
-    if len(set(y)) < 2:
-        return None
+# -----------------------------------
+# 실험 registry : (데이터 fingerprint, 피처, 윈도우, 모델, 파라미터) 해시 -> 결과 + 모델 파일
+# -----------------------------------
+ARTIFACT_DIR = "models/experiments"
+SELECT_METRIC = 'roc_auc'   # (model, window)별 대표 모델 선택 기준
+
+EXPERIMENT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS experiments (
+        key VARCHAR PRIMARY KEY,
+        model VARCHAR,
+        "window" INTEGER,
+        params VARCHAR,
+        feature_cols VARCHAR,
+        data_hash VARCHAR,
+        data_start VARCHAR,
+        data_end VARCHAR,
+        accuracy DOUBLE,
+        f1 DOUBLE,
+        roc_auc DOUBLE,
+        artifact VARCHAR,
+        created_at TIMESTAMP
+    );
+    -- walk-forward CV : fold 평균 (accuracy, f1, roc_auc) + 표준편차 / 유효 fold 수 / 검증 설정
+    ALTER TABLE experiments ADD COLUMN IF NOT EXISTS roc_auc_std DOUBLE;
+    ALTER TABLE experiments ADD COLUMN IF NOT EXISTS n_folds INTEGER;
+    ALTER TABLE experiments ADD COLUMN IF NOT EXISTS cv VARCHAR;
+    CREATE TABLE IF NOT EXISTS experiment_folds (
+        key VARCHAR,
+        fold INTEGER,
+        train_start VARCHAR,    -- label 날짜 기준 구간 (양 끝 포함)
+        train_end VARCHAR,
+        test_start VARCHAR,
+        test_end VARCHAR,
+        n_train INTEGER,
+        n_test INTEGER,
+        accuracy DOUBLE,
+        f1 DOUBLE,
+        roc_auc DOUBLE,
+        seconds DOUBLE,
+        PRIMARY KEY (key, fold)
+    );
+"""
+
+def experiment_key(data_hash, model_name, window_size, param):
+    # 검증 방식(cv)이 바뀌면 다른 실험 (이전 8:2 split 결과는 재사용하지 않음)
+    config = json.dumps({'data': data_hash, 'features': feature_cols, 'window': window_size,
+                         'model': model_name, 'params': param, 'cv': cv_config()}, sort_keys=True)
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+def cached_experiments(con, keys):
+    # 결과와 모델 파일이 모두 남아있는 실험만 재사용
+    con.execute(EXPERIMENT_SCHEMA)
+    cached = con.execute("SELECT * FROM experiments WHERE key IN (SELECT unnest(?))", [list(keys)]).fetchdf()
+    return cached[cached['artifact'].map(os.path.exists).astype(bool)]
+
+def select_best(con, data_hashes, model_dir="models"):
+    # 현재 데이터로 학습된 실험 중 (model, window)별 SELECT_METRIC 최고 모델 -> models/{model}_window{w}.pkl
+    # 같은 검증 방식(cv)의 실험끼리만 비교
+    best = con.execute(f"""
+        SELECT * FROM experiments
+        WHERE data_hash IN (SELECT unnest(?)) AND cv = ?
+        QUALIFY row_number() OVER (PARTITION BY model, "window" ORDER BY {SELECT_METRIC} DESC, key) = 1
+        ORDER BY model, "window"
+    """, [list(data_hashes), json.dumps(cv_config(), sort_keys=True)]).fetchdf()
+
+    for row in best.itertuples(index=False):
+        shutil.copyfile(row.artifact, os.path.join(model_dir, f"{row.model}_window{row.window}.pkl"))
+        print(f"[{row.model:^17}] 윈도우={row.window:>2}일 → 선택 : {row.params} ({SELECT_METRIC}={getattr(row, SELECT_METRIC):.4f})")
+    return best
 
-    # 훈련/테스트 분할 (시간 순 8:2 split)
-    split = int(len(X) * 0.8)
-    X_train, X_test = X.iloc[:split], X.iloc[split:]
-    y_train, y_test = y.iloc[:split], y.iloc[split:]
+# -----------------------------------
+# walk-forward 교차검증 : 마지막 CV_TEST_FRACTION 구간을 시간 순으로 CV_FOLDS개 test 구간으로 나누고,
+# 각 fold는 그 이전 샘플로만 학습 (expanding : 처음부터 / rolling : 첫 fold와 같은 길이만)
+# purge/embargo : 학습 끝과 test 시작 사이 CV_GAP개 샘플 제외 (label이 다음 거래일 종가를 보므로 경계 누수 방지)
+# -----------------------------------
+CV_FOLDS = 5
+CV_MODE = 'expanding'       # expanding / rolling
+CV_GAP = 5
+CV_TEST_FRACTION = 0.4
+CV_THREADS = 1              # 병렬 실험 시 모델 내부 스레드 수 (워커 수 = (코어 수 - 1) // CV_THREADS)
+THREADED = ['lightgbm', 'xgboost', 'randomforest']     # n_jobs로 내부 스레드를 쓰는 모델
+
+def cv_config():
+    return {'folds': CV_FOLDS, 'mode': CV_MODE, 'gap': CV_GAP, 'test_fraction': CV_TEST_FRACTION}
+
+def cv_folds(n_samples):
+    """ [(train slice, test slice), ...] : 윈도우 행렬(memmap)을 복사 없이 잘라 쓰는 view 범위 """
+    test_start = int(n_samples * (1 - CV_TEST_FRACTION))
+    fold_size = (n_samples - test_start) // CV_FOLDS
+    train_size = test_start - CV_GAP
+
+    folds = []
+    for fold in range(CV_FOLDS):
+        start = test_start + fold * fold_size
+        end = n_samples if fold == CV_FOLDS - 1 else start + fold_size
+        train_end = start - CV_GAP
+        train_start = 0 if CV_MODE == 'expanding' else max(0, train_end - train_size)
+        folds.append((slice(train_start, train_end), slice(start, end)))
+    return folds
+
+def fold_tasks(model_name, window_size, param, key, n_samples):
+    # 실험 1개 = fold별 평가 CV_FOLDS개 + 전체 샘플 재학습(fold = None) 1개
+    # fold 구간은 부모 프로세스에서 계산해서 전달 (spawn 워커는 CLI로 바꾼 CV_* 설정을 모름)
+    folds = cv_folds(n_samples)
+    return [(model_name, window_size, param, key, fold, *folds[fold]) for fold in range(len(folds))] + \
+           [(model_name, window_size, param, key, None, None, None)]
+
+def run_fold(args):
+    model_name, window_size, param, key, fold, train, test = args
+    # 피처셋 (flatten 방식) : 미리 만들어 둔 윈도우 행렬 사용
+    X, y = load_window(window_size)
+    start, cpu_start = time.perf_counter(), time.process_time()
+
+    if fold is None:
+        # 레이블이 단일값(예 : 전부 0)이면 학습 의미 없음 -> skip
+        if len(np.unique(y)) < 2:
+            return {'key': key, 'fold': None, 'artifact': None, 'cpu_seconds': time.process_time() - cpu_start}
+
+        # 전체 label 샘플로 재학습한 실험별 모델 파일 (대표 모델 선택은 select_best에서)
+        model = make_model(model_name, param, _worker_threads).fit(X, y)
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        artifact = os.path.join(ARTIFACT_DIR, f"{model_name}_window{window_size}_{key[:16]}.pkl")
+        joblib.dump(model, artifact)
+        return {'key': key, 'fold': None, 'artifact': artifact, 'seconds': time.perf_counter() - start,
+                'cpu_seconds': time.process_time() - cpu_start}
+
+    metrics = {'accuracy': None, 'f1': None, 'roc_auc': None}
+    if train.stop > train.start and len(np.unique(y[train])) == 2 and len(np.unique(y[test])) == 2:
+        _, metrics = train_and_evaluate(model_name, X[train], X[test], y[train], y[test], param, _worker_threads)
 
-    # 모델 학습/평가
-    model, result = train_and_evaluate(model_name, X_train, X_test, y_train, y_test, param)
+    return {
+        'key': key, 'fold': fold,
+        'train_start': train.start, 'train_end': train.stop, 'test_start': test.start, 'test_end': test.stop,
+        **metrics, 'seconds': time.perf_counter() - start, 'cpu_seconds': time.process_time() - cpu_start
+    }
 
-    # 모델 저장 경로
-    os.makedirs("models", exist_ok=True)
-    model_path = f"models/{model_name}_window{window_size}.pkl"
-    joblib.dump(model, model_path)
+def aggregate_folds(model_name, window_size, param, key, fold_results):
+    # fold 결과 -> 실험 1건 (fold 평균 / 표준편차), 재학습 모델이 없거나 평가된 fold가 없으면 None
+    refit = [r for r in fold_results if r['fold'] is None]
+    folds = sorted((r for r in fold_results if r['fold'] is not None), key=lambda r: r['fold'])
+    scored = [r for r in folds if r['roc_auc'] is not None]
+    if not refit or refit[0]['artifact'] is None or not scored:
+        return None
 
     return {
+        'key': key,
         'model': model_name,
         'window': window_size,
         'params': param,
-        **result
+        'artifact': refit[0]['artifact'],
+        'accuracy': float(np.mean([r['accuracy'] for r in scored])),
+        'f1': float(np.mean([r['f1'] for r in scored])),
+        'roc_auc': float(np.mean([r['roc_auc'] for r in scored])),
+        'roc_auc_std': float(np.std([r['roc_auc'] for r in scored])),
+        'n_folds': len(scored),
+        'folds': folds
     }
 
 # -----------------------------------
-# 전체 병렬 실험 실행
+# 단일 실험 실행 (fold 순차 실행)
 # -----------------------------------
-def run_all_experiments(df):
-    tasks = []  # 각 조합별 (df, model, window, param, feature_cols) 튜플 생성
-    for model in models:
-        for window in windows:
-            for param in param_grid[model]:
-                tasks.append((df.copy(), model, window, param, feature_cols))
+def run_one(args):
+    model_name, window_size, param, key = args
+    n_samples = len(load_window(window_size)[1])
+    return aggregate_folds(model_name, window_size, param, key,
+                           [run_fold(task) for task in fold_tasks(model_name, window_size, param, key, n_samples)])
 
+# -----------------------------------
+# 전체 병렬 실험 실행 : registry에 같은 실험이 있으면 건너뜀
+# -----------------------------------
+@telemetry.instrument('run_all_experiments')
+def run_all_experiments(df, db_path=storage.DB_PATH, threads=None):
+    # DB 연결은 캐시 조회 / 결과 저장 때만 짧게 (학습 중 다른 프로세스의 read_only 연결이 막히지 않도록)
+    threads = threads or CV_THREADS
     results = []
-    # task별 병렬 실행
-    with Pool(processes=os.cpu_count() - 1) as pool:    # 가용가능한 cpu수 - 1 사용
-        for result in tqdm(pool.imap_unordered(run_one, tasks), total=len(tasks)):
-            if result is not None:
-                results.append(result)
+    with tempfile.TemporaryDirectory(prefix="window_") as cache_dir:
+        # 윈도우 크기별로 한 번만 피처 행렬 생성
+        window_paths, fingerprints = build_window_matrices(df, windows, feature_cols, cache_dir)
+
+        tasks = []  # 각 조합별 (model, window, param, key) 튜플 생성 (데이터는 전달하지 않음)
+        for model in models:
+            for window in windows:
+                for param in param_grid[model]:
+                    tasks.append((model, window, param, experiment_key(fingerprints[window]['data_hash'], model, window, param)))
+
+        con = storage.connect(db_path)
+        try:
+            cached = cached_experiments(con, [task[3] for task in tasks])
+        finally:
+            con.close()
+        cached_keys = set(cached['key'])
+        tasks = [task for task in tasks if task[3] not in cached_keys]
+        print(f"실험 {len(tasks) + len(cached)}개 중 캐시 사용 {len(cached)}개, 새로 실행 {len(tasks)}개")
+        telemetry.count('tasks', len(tasks))
+        telemetry.count('cached', len(cached))
+
+        # (실험, fold)별 병렬 실행 : 가용가능한 cpu수 - 1개 코어를 워커 x 모델 내부 스레드로 나눔
+        if tasks:
+            folds = [task for config in tasks
+                     for task in fold_tasks(*config, len(fingerprints[config[1]]['dates']))]
+            by_key = {}
+            with Pool(processes=max(1, min(len(folds), (os.cpu_count() - 1) // threads)),
+                      initializer=init_worker, initargs=(window_paths, threads)) as pool:
+                for result in tqdm(pool.imap_unordered(run_fold, folds), total=len(folds)):
+                    by_key.setdefault(result['key'], []).append(result)
+
+            for config in tasks:
+                result = aggregate_folds(*config, by_key.get(config[3], []))
+                if result is not None:
+                    results.append(result)
+
+    con = storage.connect(db_path)
+    try:
+        # 새 실험 결과 registry 저장
+        save_experiments(con, results, fingerprints)
+
+        # 이번 데이터 기준 전체 실험 결과 (캐시 + 새 실행)
+        current = con.execute("""
+            SELECT * FROM experiments WHERE key IN (SELECT unnest(?)) ORDER BY model, "window"
+        """, [list(cached['key']) + [result['key'] for result in results]]).fetchdf()
+        best = select_best(con, [fp['data_hash'] for fp in fingerprints.values()])
+    finally:
+        con.close()
+
+    return current, best
+
+def save_experiments(con, results, fingerprints):
+    if not results:
+        return
+
+    # fold별 결과 (구간은 label 날짜로 기록)
+    fold_rows = []
+    for result in results:
+        dates = fingerprints[result['window']]['dates']
+        span = lambda start, end: (dates[start], dates[end - 1]) if end > start else (None, None)
+        for fold in result['folds']:
+            train_start, train_end = span(fold['train_start'], fold['train_end'])
+            test_start, test_end = span(fold['test_start'], fold['test_end'])
+            fold_rows.append({
+                'key': result['key'], 'fold': fold['fold'],
+                'train_start': train_start, 'train_end': train_end, 'test_start': test_start, 'test_end': test_end,
+                'n_train': fold['train_end'] - fold['train_start'], 'n_test': fold['test_end'] - fold['test_start'],
+                'accuracy': fold['accuracy'], 'f1': fold['f1'], 'roc_auc': fold['roc_auc'], 'seconds': fold['seconds']
+            })
+
+    new = pd.DataFrame(results).drop(columns='folds')
+    new['params'] = new['params'].map(lambda param: json.dumps(param, sort_keys=True))
+    new['cv'] = json.dumps(cv_config(), sort_keys=True)
+    new['feature_cols'] = json.dumps(feature_cols)
+    new['data_hash'] = new['window'].map(lambda w: fingerprints[w]['data_hash'])
+    new['data_start'] = new['window'].map(lambda w: fingerprints[w]['data_start'])
+    new['data_end'] = new['window'].map(lambda w: fingerprints[w]['data_end'])
+    new['created_at'] = datetime.now()
+    con.execute(EXPERIMENT_SCHEMA)
+    con.register("new_experiments", new)
+    con.register("new_folds", pd.DataFrame(fold_rows))
+    con.execute("INSERT OR REPLACE INTO experiments BY NAME SELECT * FROM new_experiments")
+    con.execute("INSERT OR REPLACE INTO experiment_folds BY NAME SELECT * FROM new_folds")
+    con.unregister("new_experiments")
+    con.unregister("new_folds")
 
-    return results
+# -----------------------------------
+# 하이퍼파라미터 탐색 : successive halving
+# 많은 후보(model, window, params)를 적은 예산(트리 수 / 최근 이력 일부)으로 먼저 평가하고,
+# 검증 성능 상위 1/eta만 다음 단계(예산 eta배)로 올림 -> 마지막 후보만 전체 학습 후 실험 registry 저장
+# 검증 : 시간 순 (test 구간 이전의 마지막 VAL_FRACTION 구간, 모든 윈도우가 같은 label 날짜)
+# -----------------------------------
+SEARCH_SPACE = {
+    'lightgbm': {'n_estimators': [100, 200, 400], 'learning_rate': [0.01, 0.03, 0.1],
+                 'num_leaves': [7, 15, 31, 63], 'min_child_samples': [5, 10, 20], 'colsample_bytree': [0.5, 0.8, 1.0]},
+    'xgboost': {'n_estimators': [100, 200, 400], 'learning_rate': [0.01, 0.03, 0.1],
+                'max_depth': [2, 3, 5], 'subsample': [0.7, 1.0], 'colsample_bytree': [0.5, 0.8, 1.0]},
+    'randomforest': {'n_estimators': [100, 200, 400], 'max_depth': [3, 5, 10, None],
+                     'min_samples_leaf': [1, 5, 10], 'max_features': ['sqrt', 0.3]},
+    'decisiontree': {'max_depth': [2, 3, 5, 8], 'min_samples_leaf': [1, 5, 20]},
+    'gradientboosting': {'n_estimators': [100, 200], 'learning_rate': [0.03, 0.1],
+                         'max_depth': [2, 3], 'subsample': [0.7, 1.0]},
+}
+VAL_FRACTION = 0.2          # CV test 구간 이전 샘플 중 검증에 사용할 마지막 구간 비율
+MIN_SEARCH_SAMPLES = 50     # 예산이 작아도 최소 학습 샘플 수
+MIN_ESTIMATORS = 10
+
+SEARCH_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_trials (
+        search_id VARCHAR,
+        rung INTEGER,
+        budget DOUBLE,          -- 전체 대비 예산 비율 (트리 수, 학습 이력)
+        model VARCHAR,
+        "window" INTEGER,
+        params VARCHAR,
+        n_train INTEGER,
+        n_estimators INTEGER,
+        val_accuracy DOUBLE,
+        val_roc_auc DOUBLE,
+        seconds DOUBLE,
+        cpu_seconds DOUBLE
+    )
+"""
+
+def sample_candidates(n_candidates, rng):
+    # SEARCH_SPACE에서 중복 없이 (model, window, params) 무작위 추출
+    space_size = sum(int(np.prod([len(v) for v in SEARCH_SPACE[m].values()])) for m in models) * len(windows)
+    seen, candidates = set(), []
+    while len(candidates) < min(n_candidates, space_size):
+        model = models[rng.integers(len(models))]
+        window = windows[rng.integers(len(windows))]
+        param = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE[model].items()}
+        key = json.dumps([model, window, param], sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append((model, window, param))
+    return candidates
+
+def window_dates(df, window_size):
+    # window_samples와 같은 샘플(label 있는 행)의 label 날짜
+    dates = df['date'].to_numpy()[window_size:]
+    return dates[df['label'].notna().to_numpy()[window_size:]]
+
+def search_splits(df, window_sizes):
+    # 윈도우별 검증 구간 [val_start, val_end) : 모든 윈도우가 같은 label 날짜로 평가되도록 날짜 기준
+    # (walk-forward CV의 gap + test 구간 이전에서만 탐색)
+    dates = {w: window_dates(df, w) for w in window_sizes}
+    test_start = {w: int(len(d) * (1 - CV_TEST_FRACTION)) - CV_GAP for w, d in dates.items()}
+    val_end_date = min(d[test_start[w]] for w, d in dates.items())
+    first = min(window_sizes)
+    val_start_date = dates[first][int(test_start[first] * (1 - VAL_FRACTION))]
+    return {w: (int(np.searchsorted(d, val_start_date)), int(np.searchsorted(d, val_end_date))) for w, d in dates.items()}
+
+def budget_params(param, fraction):
+    # 부분 예산 : 트리 수를 예산 비율만큼 축소
+    if 'n_estimators' not in param:
+        return param
+    return {**param, 'n_estimators': max(MIN_ESTIMATORS, int(round(param['n_estimators'] * fraction)))}
+
+def run_trial(args):
+    idx, model_name, window_size, param, fraction, val_start, val_end = args
+    X, y = load_window(window_size)
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    # 부분 예산 : 검증 구간 직전의 최근 이력 일부만 학습
+    n_train = min(val_start, max(MIN_SEARCH_SAMPLES, int(val_start * fraction)))
+    train, val = slice(val_start - n_train, val_start), slice(val_start, val_end)
+    budgeted = budget_params(param, fraction)
+
+    metrics = {'accuracy': None, 'roc_auc': None}
+    if len(np.unique(y[train])) == 2 and len(np.unique(y[val])) == 2:
+        _, metrics = train_and_evaluate(model_name, X[train], X[val], y[train], y[val], budgeted, _worker_threads)
+
+    return {
+        'idx': idx, 'model': model_name, 'window': window_size, 'params': json.dumps(param, sort_keys=True),
+        'budget': fraction, 'n_train': n_train, 'n_estimators': budgeted.get('n_estimators'),
+        'val_accuracy': metrics['accuracy'], 'val_roc_auc': metrics['roc_auc'],
+        'seconds': time.perf_counter() - wall, 'cpu_seconds': time.process_time() - cpu
+    }
+
+@telemetry.instrument('hyperparameter_search')
+def successive_halving(df, db_path=storage.DB_PATH, n_candidates=81, eta=3, min_budget=1/9, budget_seconds=None, budget_cpu=None,
+                       n_final=None, seed=0):
+    """ (탐색 기록, 최종 후보 실험 결과, 대표 모델) : 예산(wall / CPU 초)을 넘으면 그때까지의 결과로 최종 후보 선택 """
+    search_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+    candidates = sample_candidates(n_candidates, np.random.default_rng(seed))
+
+    # 단계별 예산 비율 : min_budget, min_budget * eta, ..., 1.0
+    rungs = []
+    fraction = min_budget
+    while fraction < 1:
+        rungs.append(fraction)
+        fraction *= eta
+    rungs.append(1.0)
+    n_final = n_final or max(1, len(candidates) // eta ** len(rungs))
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    worker_cpu = 0.0
+    def over_budget():
+        # CPU 예산 = 메인 프로세스 + 워커에서 실행된 trial CPU 시간 합
+        return ((budget_seconds is not None and time.perf_counter() - wall_start > budget_seconds) or
+                (budget_cpu is not None and time.process_time() - cpu_start + worker_cpu > budget_cpu))
+
+    trials, scores, stopped = [], {}, False     # scores : 후보 -> (도달한 단계, 검증 ROC-AUC)
+    alive = list(range(len(candidates)))
+    with tempfile.TemporaryDirectory(prefix="window_") as cache_dir:
+        window_paths, fingerprints = build_window_matrices(df, windows, feature_cols, cache_dir)
+        splits = search_splits(df, windows)
+
+        n_workers = max(1, min(len(candidates), (os.cpu_count() - 1) // CV_THREADS))
+        with Pool(processes=n_workers, initializer=init_worker, initargs=(window_paths, CV_THREADS)) as pool:
+            for rung, fraction in enumerate(rungs):
+                tasks = [(i, *candidates[i], fraction, *splits[candidates[i][1]]) for i in alive]
+                print(f"[탐색 {rung + 1}/{len(rungs)}] 후보 {len(tasks)}개, 예산 {fraction:.3f}")
+                for result in tqdm(pool.imap_unordered(run_trial, tasks), total=len(tasks)):
+                    worker_cpu += result['cpu_seconds']
+                    trials.append({'search_id': search_id, 'rung': rung, **result})
+                    if result['val_roc_auc'] is not None:
+                        scores[result['idx']] = (rung, result['val_roc_auc'])
+                    if over_budget():
+                        stopped = True
+                        break
+                if stopped:
+                    print(f"예산 초과 -> {rung + 1}단계에서 탐색 중단")
+                    break
+
+                # 다음 단계 : 이번 단계 검증 성능 상위 1/eta
+                ranked = sorted((i for i in alive if scores.get(i, (None,))[0] == rung), key=lambda i: -scores[i][1])
+                alive = ranked[:max(1, len(ranked) // eta)]
+
+            # 최종 후보 : 더 높은 단계까지 올라간 후보 우선, 같은 단계는 검증 성능 순
+            finalists = sorted(scores, key=lambda i: scores[i], reverse=True)[:n_final]
+
+            # 최종 후보만 walk-forward CV + 전체 재학습 -> 실험 registry
+            # 같은 Pool에서 워커 수만큼씩 실행, 묶음마다 시작 전에 예산 확인
+            results = []
+            for b in range(0, len(finalists), n_workers):
+                if over_budget():
+                    print(f"예산 초과 -> 최종 후보 {len(finalists)}개 중 {b}개만 학습")
+                    break
+
+                configs = []
+                for i in finalists[b:b + n_workers]:
+                    model_name, window_size, param = candidates[i]
+                    key = experiment_key(fingerprints[window_size]['data_hash'], model_name, window_size, param)
+                    configs.append((model_name, window_size, param, key))
+                folds = [task for config in configs
+                         for task in fold_tasks(*config, len(fingerprints[config[1]]['dates']))]
+
+                by_key = {}
+                for result in pool.imap_unordered(run_fold, folds):
+                    worker_cpu += result['cpu_seconds']
+                    by_key.setdefault(result['key'], []).append(result)
+
+                for model_name, window_size, param, key in configs:
+                    result = aggregate_folds(model_name, window_size, param, key, by_key.get(key, []))
+                    if result is not None:
+                        results.append(result)
+                        print(f"[{model_name:^17}] 윈도우={window_size:>2}일 → 최종 학습 {param} (roc_auc={result['roc_auc']:.4f})")
+
+    telemetry.count('trials', len(trials))
+    telemetry.count('finalists', len(results))
+
+    trials = pd.DataFrame(trials).drop(columns='idx')
+    # 탐색이 끝난 뒤에만 DB 연결 (탐색 중 다른 프로세스의 read_only 연결이 막히지 않도록)
+    con = storage.connect(db_path)
+    try:
+        con.execute(SEARCH_SCHEMA)
+        con.register("trials_df", trials)
+        con.execute("INSERT INTO search_trials BY NAME SELECT * FROM trials_df")
+        con.unregister("trials_df")
+
+        save_experiments(con, results, fingerprints)
+        best = select_best(con, [fp['data_hash'] for fp in fingerprints.values()])
+    finally:
+        con.close()
+    print(f"탐색 {len(trials)}회 ({time.perf_counter() - wall_start:.1f}s), 최종 학습 {len(results)}개")
+    return trials, pd.DataFrame(results), best
+
+# -----------------------------------
+# 증분 학습 : 부스팅 모델은 저장된 booster에 새 샘플로 이어서 학습,
+# 나머지 모델은 오래됐거나(staleness) 성능이 떨어졌을 때(drift)만 전체 재학습
+# -----------------------------------
+BOOSTED = ['lightgbm', 'xgboost']
+WARM_ROUNDS = 10            # 이어서 학습할 때 추가할 트리 수
+WARM_LEARNING_RATE = 0.1    # 이어서 학습하는 트리의 learning_rate 배율 (소수 샘플에 과적합 방지)
+MIN_WARM_SAMPLES = 20       # 새 샘플이 이 개수 이상 모였을 때만 이어서 학습
+WARM_HOLDOUT = 120          # 이어서 학습한 모델 검증 : 새 샘플 직전 최근 샘플 수
+WARM_TOLERANCE = 0.02       # 검증 정확도가 기존 모델보다 이만큼 넘게 떨어지면 전체 재학습
+MAX_STALE_DAYS = 30         # 마지막 전체 학습 후 이 기간이 지나면 전체 재학습
+MIN_DRIFT_SAMPLES = 10      # drift 판단에 필요한 최소 새 샘플 수
+DRIFT_TOLERANCE = 0.1       # 새 샘플 정확도가 전체 학습 시 test 정확도보다 이만큼 낮으면 재학습
+
+TRAINING_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS training_runs (
+        run_at TIMESTAMP,
+        model VARCHAR,
+        "window" INTEGER,
+        mode VARCHAR,           -- full / warm / skip / experiment
+        watermark VARCHAR,      -- 학습에 사용한 마지막 label 날짜
+        n_samples INTEGER,
+        n_new INTEGER,
+        accuracy DOUBLE,        -- full / experiment : test 정확도, 그 외 : 새 샘플 정확도
+        drift DOUBLE,
+        seconds DOUBLE,
+        PRIMARY KEY (run_at, model, "window")
+    )
+"""
+
+def last_training(con, model_name, window_size):
+    # (watermark, 마지막 전체 학습 시각, 전체 학습 시 test 정확도)
+    watermark = con.execute("""
+        SELECT max(watermark) FROM training_runs
+        WHERE model = ? AND "window" = ? AND mode IN ('full', 'warm', 'experiment')
+    """, [model_name, window_size]).fetchone()[0]
+    full = con.execute("""
+        SELECT run_at, accuracy FROM training_runs
+        WHERE model = ? AND "window" = ? AND mode IN ('full', 'experiment')
+        ORDER BY run_at DESC LIMIT 1
+    """, [model_name, window_size]).fetchone()
+    return (watermark, *(full or (None, None)))
+
+def full_fit(model_name, X, y, model=None):
+    # 시간 순 8:2 split으로 test 정확도 측정 후, 전체 샘플로 다시 학습 (기존 모델이 있으면 같은 하이퍼파라미터)
+    split = int(len(X) * 0.8)
+    if model is None:
+        model, result = train_and_evaluate(model_name, X[:split], X[split:], y[:split], y[split:], param_grid[model_name][0])
+    else:
+        model = clone(model).fit(X[:split], y[:split])
+        result = {'accuracy': accuracy_score(y[split:], model.predict(X[split:]))}
+
+    return clone(model).fit(X, y), result['accuracy']
+
+def warm_fit(model_name, old_model, X_new, y_new):
+    # 기존 booster에 WARM_ROUNDS개 트리를 새 샘플로 이어서 학습 (낮은 learning_rate)
+    params = old_model.get_params()
+    learning_rate = params['learning_rate'] or 0.3      # xgboost 기본값 None = 0.3
+    model = clone(old_model).set_params(n_estimators=WARM_ROUNDS, learning_rate=learning_rate * WARM_LEARNING_RATE)
+    if model_name == 'lightgbm':
+        # 새 샘플 수가 적으면 기본 min_child_samples(20)로는 분할이 불가능 -> 이어서 학습할 때만 낮춤
+        model.set_params(min_child_samples=max(2, min(params['min_child_samples'], len(X_new) // 4)))
+        model.fit(X_new, y_new, init_model=old_model.booster_)
+        model.set_params(min_child_samples=params['min_child_samples'])
+    else:
+        # 소수 샘플로 잎 하나가 만들어지지 않도록 최소 hessian 합 상향
+        model.set_params(min_child_weight=max(params['min_child_weight'] or 1, len(X_new) / 16))
+        model.fit(X_new, y_new, xgb_model=old_model.get_booster())
+        model.set_params(min_child_weight=params['min_child_weight'])
+    # 다음 전체 재학습은 원래 트리 수 / learning_rate로
+    return model.set_params(n_estimators=params['n_estimators'], learning_rate=params['learning_rate'])
+
+def warm_regressed(old_model, model, X_holdout, y_holdout):
+    # 새 샘플 직전 구간에서 기존 모델 대비 정확도 하락 여부 (학습 이력을 잊어버렸는지)
+    if not len(y_holdout):
+        return False
+    old_accuracy = accuracy_score(y_holdout, old_model.predict(X_holdout))
+    return accuracy_score(y_holdout, model.predict(X_holdout)) < old_accuracy - WARM_TOLERANCE
+
+def incremental_train(con, df, model_dir="models"):
+    con.execute(TRAINING_SCHEMA)
+    run_at = datetime.now()
+    os.makedirs(model_dir, exist_ok=True)
+
+    runs = []
+    for window in windows:
+        X, y, dates = window_samples(df, window, feature_cols)
+
+        for model_name in models:
+            start = time.perf_counter()
+            model_path = os.path.join(model_dir, f"{model_name}_window{window}.pkl")
+            model = joblib.load(model_path) if os.path.exists(model_path) else None
+            watermark, last_full, base_accuracy = last_training(con, model_name, window)
+
+            # watermark 이후 label이 생긴 새 샘플
+            new = dates > watermark if (model is not None and watermark) else np.ones(len(dates), dtype=bool)
+            n_new = int(new.sum())
+            accuracy = drift = None
+            if model is not None and n_new:
+                accuracy = accuracy_score(y[new], model.predict(X[new]))
+                drift = base_accuracy - accuracy if base_accuracy is not None else None
+
+            stale = last_full is None or (run_at - last_full).days >= MAX_STALE_DAYS
+            drifted = drift is not None and n_new >= MIN_DRIFT_SAMPLES and drift > DRIFT_TOLERANCE
+
+            if model is None or watermark is None or stale or drifted:
+                mode = 'full'
+                model, accuracy = full_fit(model_name, X, y, model)
+                watermark = dates[-1]
+            elif model_name in BOOSTED and n_new >= MIN_WARM_SAMPLES and len(np.unique(y[new])) == 2:
+                warm = warm_fit(model_name, model, X[new], y[new])
+                holdout = np.flatnonzero(~new)[-WARM_HOLDOUT:]
+                if warm_regressed(model, warm, X[holdout], y[holdout]):
+                    # 이어서 학습한 모델이 기존 구간 성능을 떨어뜨림 -> 저장하지 않고 전체 재학습
+                    mode = 'full'
+                    model, accuracy = full_fit(model_name, X, y, model)
+                else:
+                    mode = 'warm'
+                    model = warm
+                watermark = dates[-1]
+            else:
+                # 새 샘플은 다음 실행까지 누적 (watermark 유지)
+                mode = 'skip'
+
+            if mode != 'skip':
+                joblib.dump(model, model_path)
+
+            runs.append({
+                'run_at': run_at, 'model': model_name, 'window': window, 'mode': mode,
+                'watermark': watermark, 'n_samples': len(X), 'n_new': n_new,
+                'accuracy': accuracy, 'drift': drift, 'seconds': time.perf_counter() - start
+            })
+            print(f"[{model_name:^17}] 윈도우={window:>2}일 → {mode:<5} (새 샘플 {n_new}개, {runs[-1]['seconds']:.2f}s)")
+
+    record_runs(con, runs)
+    return runs
+
+def record_runs(con, runs):
+    con.execute(TRAINING_SCHEMA)
+    con.register("runs_df", pd.DataFrame(runs))
+    con.execute("INSERT INTO training_runs BY NAME SELECT * FROM runs_df")
+    con.unregister("runs_df")
 
 # -----------------------------------
 # Markdown 형식으로 실험 결과 요약 파일 저장
@@ -169,23 +794,62 @@ def save_markdown_summary(csv_path: str, md_path: str):
 
 # 메인 실행
 if __name__ == "__main__":
+    # 전체 실험 : python sliding_window.py
+    # 증분 학습 (매일 실행) : python sliding_window.py --incremental
+    # 하이퍼파라미터 탐색 : python sliding_window.py --search --candidates 81 --eta 3 --budget-seconds 1800
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--search', action='store_true')
+    parser.add_argument('--candidates', type=int, default=81)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--min-budget', type=float, default=1/9)
+    parser.add_argument('--budget-seconds', type=float, help="탐색 전체 wall-clock 예산 (초)")
+    parser.add_argument('--budget-cpu', type=float, help="탐색 전체 CPU 예산 (초, 워커 포함)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--folds', type=int, default=CV_FOLDS, help="walk-forward 검증 fold 수")
+    parser.add_argument('--cv-mode', choices=['expanding', 'rolling'], default=CV_MODE)
+    parser.add_argument('--gap', type=int, default=CV_GAP, help="학습 끝과 test 시작 사이 제외할 샘플 수")
+    parser.add_argument('--threads', type=int, default=CV_THREADS, help="워커별 모델 내부 스레드 수")
+    args = parser.parse_args()
+    CV_FOLDS, CV_MODE, CV_GAP, CV_THREADS = args.folds, args.cv_mode, args.gap, args.threads
+
     today = datetime.today()
     date_name = today.strftime('%y%m%d')  # ex: 250504
-    db_path = f"{date_name}_sentiment_stock.duckdb"
-
-    con = duckdb.connect(db_path)
-    df = con.execute("SELECT * FROM merged_data ORDER BY date").fetchdf()
-
-    # 뉴스 원문 컬럼 제거 (숫자 형태의 컬럼 제거)
-    cols_to_remove = [col for col in df.columns if col.isdigit()]
-    df = df.drop(columns=cols_to_remove)
 
-    results = run_all_experiments(df)
+    con = storage.connect(read_only=True)
+    df = load_features(con)     # merged_data + 파생 피처 (기사 원문은 로드하지 않음)
+    con.close()
 
-    results_df = pd.DataFrame(results)
-    csv_path = f"{date_name}_experiment_results.csv"
-    md_path = f"{date_name}_experiment_summary.md"
-    results_df.to_csv(csv_path, index=False)
-    save_markdown_summary(csv_path, md_path)
-
-    print("실험 완료")
+    if args.incremental:
+        con = storage.connect()
+        incremental_train(con, df)
+        con.close()
+        print("증분 학습 완료")
+    else:
+        # 실험 / 탐색 함수가 필요할 때만 짧게 DB 연결 (실행 중에도 예측 서비스가 DB를 읽을 수 있도록)
+        if args.search:
+            trials, results_df, best = successive_halving(df, storage.DB_PATH, args.candidates, args.eta, args.min_budget,
+                                                          args.budget_seconds, args.budget_cpu, seed=args.seed)
+            trials.to_csv(f"{date_name}_search_trials.csv", index=False)
+        else:
+            results_df, best = run_all_experiments(df)
+
+            csv_path = f"{date_name}_experiment_results.csv"
+            md_path = f"{date_name}_experiment_summary.md"
+            results_df[['model', 'window', 'params', 'accuracy', 'f1', 'roc_auc', 'roc_auc_std', 'n_folds']].to_csv(csv_path, index=False)
+            save_markdown_summary(csv_path, md_path)
+
+        # 선택된 대표 모델(전체 label 샘플로 재학습)의 watermark 기록 -> 이후 증분 학습 기준
+        runs = []
+        for row in best.itertuples(index=False):
+            _, _, dates = window_samples(df, row.window, feature_cols)
+            runs.append({
+                'run_at': today, 'model': row.model, 'window': row.window, 'mode': 'experiment',
+                'watermark': dates[-1], 'n_samples': len(dates),
+                'n_new': None, 'accuracy': row.accuracy, 'drift': None, 'seconds': None
+            })
+        con = storage.connect()
+        record_runs(con, runs)
+        con.close()
+
+        print("실험 완료")
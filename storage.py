@@ -0,0 +1,342 @@
+import os
+import argparse
+import hashlib
+import unicodedata
+import duckdb
+import pandas as pd
+
+import trading_calendar
+from features import FEATURE_SCHEMA, refresh_features
+from prices import PRICE_SCHEMA
+
+# -----------------------------------
+# 설정: 단일 DuckDB 파일 / 테이블 스키마
+# -----------------------------------
+DB_PATH = "sentiment_stock.duckdb"
+PRICE_COLS = ['open', 'high', 'low', 'close', 'volume']
+MERGED_COLS = ['date', 'news_count', 'avg_negative', 'avg_neutral', 'avg_positive'] + PRICE_COLS + ['label']
+ARTICLE_COLS = ['date', 'seq', 'media', 'text', 'hash']
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS merged_data (
+        date VARCHAR PRIMARY KEY,
+        news_count BIGINT,
+        avg_negative DOUBLE,
+        avg_neutral DOUBLE,
+        avg_positive DOUBLE,
+        open DOUBLE,
+        high DOUBLE,
+        low DOUBLE,
+        close DOUBLE,
+        volume DOUBLE,
+        label BIGINT
+    );
+    CREATE TABLE IF NOT EXISTS articles (
+        date VARCHAR,
+        seq INTEGER,
+        media VARCHAR,
+        text VARCHAR,
+        hash VARCHAR,
+        PRIMARY KEY (date, seq)
+    );
+    CREATE TABLE IF NOT EXISTS crawl_pages (
+        run_key VARCHAR,
+        page INTEGER,
+        pos INTEGER,
+        date VARCHAR,
+        media VARCHAR,
+        text VARCHAR,
+        PRIMARY KEY (run_key, page, pos)
+    );
+    CREATE TABLE IF NOT EXISTS crawl_checkpoint (
+        run_key VARCHAR PRIMARY KEY,
+        last_page INTEGER,
+        total_page INTEGER,
+        done BOOLEAN
+    );
+    -- 파이프라인 단계 간 전달용 일별 감성 결과 (merged_data 적재 전)
+    CREATE TABLE IF NOT EXISTS daily_sentiment (
+        date VARCHAR PRIMARY KEY,
+        news_count BIGINT,
+        avg_negative DOUBLE,
+        avg_neutral DOUBLE,
+        avg_positive DOUBLE
+    );
+"""
+
+def connect(db_path=DB_PATH, read_only=False):
+    con = duckdb.connect(db_path, read_only=read_only)
+    if not read_only:
+        con.execute(SCHEMA)
+        con.execute(FEATURE_SCHEMA)
+        con.execute(PRICE_SCHEMA)
+    return con
+
+def load_merged(con):
+    # 숫자 컬럼만 있는 일별 테이블 (기사 원문은 articles 테이블)
+    return con.execute("SELECT * FROM merged_data ORDER BY date").fetchdf()
+
+def load_articles(con, start=None, end=None):
+    return con.execute("""
+        SELECT * FROM articles
+        WHERE date >= coalesce(?, date) AND date <= coalesce(?, date)
+        ORDER BY date, seq
+    """, [start, end]).fetchdf()
+
+# -----------------------------------
+# 기사 원문 정규화 / 해시
+# -----------------------------------
+def normalize_text(text: str):
+    # 유니코드 정규화 + 연속 공백 정리
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+def article_hash(text: str):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+def wide_to_articles(news_df):
+    """ wide 형식(date, "1".."N" 기사 컬럼) -> long 형식 articles (date, seq, media, text, hash) """
+    article_cols = [col for col in news_df.columns if str(col).isdigit()]
+    articles = news_df.melt(id_vars='date', value_vars=article_cols, var_name='seq', value_name='text')
+    articles = articles[articles['text'].notna() & (articles['text'].astype(str).str.strip() != '')]
+
+    articles['seq'] = articles['seq'].astype(int)
+    articles['media'] = None
+    articles['hash'] = articles['text'].map(article_hash)
+
+    return articles.sort_values(['date', 'seq'])[ARTICLE_COLS].reset_index(drop=True)
+
+# -----------------------------------
+# 일별 데이터 upsert : 새 날짜 행 + 직전 거래일 이후 행(label) + 이후 파생 피처만 갱신
+# -----------------------------------
+def upsert_days(con, new_rows, articles=None, with_features=True):
+    new_rows = new_rows.sort_values('date').reset_index(drop=True)
+    first_date, last_date = new_rows['date'].iloc[0], new_rows['date'].iloc[-1]
+
+    con.execute("BEGIN TRANSACTION")
+    try:
+        # 직전 거래일 ~ 새 구간 ~ 다음 거래일 범위 행 (forward fill, label 계산용)
+        prev_day = str(trading_calendar.prev_trading_day(first_date))
+        next_day = str(trading_calendar.next_trading_day(last_date))
+        prev_rows = con.execute("""
+            SELECT * FROM merged_data
+            WHERE date < ? AND date >= least(?, coalesce((SELECT max(date) FROM merged_data WHERE date < ?), ?))
+            ORDER BY date
+        """, [first_date, prev_day, first_date, prev_day]).fetchdf()
+        next_rows = con.execute("SELECT * FROM merged_data WHERE date > ? AND date <= ? ORDER BY date",
+                                [last_date, next_day]).fetchdf()
+
+        # 새 구간 뒤 비거래일 행 : 예전 직전 거래일 주가로 채워져 있음 -> 비우고 다시 채움
+        # (다음 거래일 행은 자체 주가 / label이 그대로이므로 제외)
+        stale = next_rows['date'] < next_day
+        next_rows.loc[stale, PRICE_COLS] = None
+
+        # 비거래일(주말, 공휴일) 주가는 직전 거래일 값으로 채움
+        window = trading_calendar.ffill_prices(pd.concat([prev_rows, new_rows, next_rows], ignore_index=True))
+
+        # target = 다음 거래일 종가 대비 등락 여부(상승 : 1 / 하락or유지 : 0), 다음 거래일이 없으면 NULL
+        window['label'] = trading_calendar.label_next_trading_day(window)
+
+        n_prev, n_new = len(prev_rows), len(new_rows)
+        patched_new = window.iloc[n_prev:n_prev + n_new][MERGED_COLS]
+        patched_next = window.iloc[n_prev + n_new:][stale.to_numpy()]
+
+        # 새 날짜 행 교체 (재실행 시 같은 날짜 덮어쓰기)
+        con.register("new_rows", patched_new)
+        con.execute("DELETE FROM merged_data WHERE date IN (SELECT date FROM new_rows)")
+        con.execute("INSERT INTO merged_data BY NAME SELECT * FROM new_rows")
+
+        # 직전 거래일 이후 행 label 갱신
+        for date, label in window.iloc[:n_prev][['date', 'label']].itertuples(index=False):
+            con.execute("UPDATE merged_data SET label = ? WHERE date = ?",
+                        [None if pd.isna(label) else int(label), date])
+
+        # 새 구간 뒤 비거래일 행 주가 / label 갱신
+        for row in patched_next[['date'] + PRICE_COLS + ['label']].itertuples(index=False):
+            con.execute(f"UPDATE merged_data SET {', '.join(f'{c} = ?' for c in PRICE_COLS)}, label = ? WHERE date = ?",
+                        [None if pd.isna(v) else float(v) for v in row[1:-1]] +
+                        [None if pd.isna(row.label) else int(row.label), row.date])
+
+        # 같은 날짜 기사 교체
+        if articles is not None:
+            con.register("new_articles", articles[ARTICLE_COLS])
+            con.execute("DELETE FROM articles WHERE date IN (SELECT date FROM new_rows)")
+            con.execute("INSERT INTO articles BY NAME SELECT * FROM new_articles")
+            con.unregister("new_articles")
+
+        # 새 구간부터 끝까지 파생 피처 재계산 (갱신된 뒤 행 포함, 최대 윈도우만큼의 이전 행만 참조)
+        # (파이프라인에서는 별도 단계로 실행)
+        if with_features:
+            refresh_features(con, since=first_date)
+
+        con.execute("COMMIT")
+    except Exception:
+        # 실패 시 전체 롤백 -> 기존 이력 보존
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("new_rows")
+
+# -----------------------------------
+# 크롤링 페이지 저장 / checkpoint (run_key = "start~end")
+# -----------------------------------
+CRAWL_COLS = ['page', 'pos', 'date', 'media', 'text']
+
+def save_crawl_page(con, run_key, page, total_page, records):
+    page_df = pd.DataFrame(records, columns=['date', 'media', 'text'])
+    page_df.insert(0, 'pos', range(len(page_df)))
+    page_df.insert(0, 'page', page)
+
+    # 페이지 기사 + checkpoint를 하나의 트랜잭션으로 저장
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.register("page_df", page_df)
+        con.execute("DELETE FROM crawl_pages WHERE run_key = ? AND page = ?", [run_key, page])
+        con.execute("INSERT INTO crawl_pages SELECT ?, * FROM page_df", [run_key])
+        con.execute("INSERT OR REPLACE INTO crawl_checkpoint VALUES (?, ?, ?, false)", [run_key, page, total_page])
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("page_df")
+
+    return page_df
+
+def load_crawl_pages(con, run_key):
+    return con.execute(f"""
+        SELECT {', '.join(CRAWL_COLS)} FROM crawl_pages WHERE run_key = ? ORDER BY page, pos
+    """, [run_key]).fetchdf()
+
+def get_crawl_checkpoint(con, run_key):
+    # (마지막 저장 페이지, 전체 페이지 수, 완료 여부)
+    row = con.execute("SELECT last_page, total_page, done FROM crawl_checkpoint WHERE run_key = ?",
+                      [run_key]).fetchone()
+    return row if row else (0, None, False)
+
+def finish_crawl(con, run_key):
+    con.execute("UPDATE crawl_checkpoint SET done = true WHERE run_key = ?", [run_key])
+
+def clear_crawl(con, run_key):
+    # DB 적재 완료 후 임시 크롤링 데이터 삭제
+    con.execute("DELETE FROM crawl_pages WHERE run_key = ?", [run_key])
+    con.execute("DELETE FROM crawl_checkpoint WHERE run_key = ?", [run_key])
+
+# -----------------------------------
+# 일별 감성 결과 (파이프라인 sentiment 단계 -> merge 단계)
+# -----------------------------------
+SENTIMENT_COLS = ['date', 'news_count', 'avg_negative', 'avg_neutral', 'avg_positive']
+
+def save_daily_sentiment(con, sentiment_df):
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.register("sentiment_df", sentiment_df[SENTIMENT_COLS])
+        con.execute("INSERT OR REPLACE INTO daily_sentiment BY NAME SELECT * FROM sentiment_df")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("sentiment_df")
+
+def apply_daily_sentiment(con, sentiment_df):
+    # 이미 적재된 날짜의 merged_data 감성 컬럼 갱신 (backfill 재분석) + 해당 기간 파생 피처 재계산
+    if sentiment_df.empty:
+        return 0
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.register("sentiment_df", sentiment_df[SENTIMENT_COLS])
+        updated = con.execute("""
+            UPDATE merged_data SET news_count = s.news_count, avg_negative = s.avg_negative,
+                                   avg_neutral = s.avg_neutral, avg_positive = s.avg_positive
+            FROM sentiment_df s WHERE merged_data.date = s.date
+        """).fetchone()[0]
+        refresh_features(con, since=sentiment_df['date'].min())
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("sentiment_df")
+    return updated
+
+def load_daily_sentiment(con, start, end):
+    return con.execute(f"""
+        SELECT {', '.join(SENTIMENT_COLS)} FROM daily_sentiment WHERE date BETWEEN ? AND ? ORDER BY date
+    """, [start, end]).fetchdf()
+
+# -----------------------------------
+# 전체 label 재계산 : 다음 "행"이 아닌 다음 KRX 거래일 종가 기준
+# (기존 weekend 데이터는 금요일 label이 토요일 ffill 종가와 비교되어 항상 0)
+# -----------------------------------
+def relabel(con):
+    merged = load_merged(con)
+    labels = pd.DataFrame({'date' : merged['date'], 'label' : trading_calendar.label_next_trading_day(merged)})
+
+    con.register("labels_df", labels)
+    con.execute("UPDATE merged_data SET label = labels_df.label FROM labels_df WHERE merged_data.date = labels_df.date")
+    con.unregister("labels_df")
+
+    return int((labels['label'].fillna(-1) != merged['label'].astype('Int64').fillna(-1)).sum())
+
+# -----------------------------------
+# wide 형식 테이블("1".."N" 기사 컬럼) -> merged_data(숫자) + articles 분리
+# -----------------------------------
+def split_articles(con, merged):
+    article_cols = [col for col in merged.columns if str(col).isdigit()]
+    articles = wide_to_articles(merged[['date'] + article_cols])
+    numeric = merged[MERGED_COLS]
+
+    con.execute("BEGIN TRANSACTION")
+    con.execute("DROP TABLE IF EXISTS merged_data")
+    con.execute("DROP TABLE IF EXISTS articles")
+    con.execute(SCHEMA)
+    con.register("numeric_df", numeric)
+    con.register("articles_df", articles)
+    con.execute("INSERT INTO merged_data BY NAME SELECT * FROM numeric_df")
+    con.execute("INSERT INTO articles BY NAME SELECT * FROM articles_df")
+    relabel(con)
+    refresh_features(con)
+    con.execute("COMMIT")
+    con.unregister("numeric_df")
+    con.unregister("articles_df")
+
+    return len(numeric), len(articles)
+
+# -----------------------------------
+# 기존 일자별 파일({yymmdd}_sentiment_stock.duckdb) 또는 wide 형식 단일 DB -> 단일 DB 이관
+# -----------------------------------
+def migrate_legacy(legacy_path, db_path=DB_PATH):
+    if os.path.exists(db_path) and os.path.abspath(db_path) != os.path.abspath(legacy_path):
+        print(f"이미 DB가 존재합니다: {db_path}")
+        return
+
+    legacy = duckdb.connect(legacy_path, read_only=True)
+    merged = legacy.execute("SELECT * FROM merged_data ORDER BY date").fetchdf()
+    legacy.close()
+
+    if not any(str(col).isdigit() for col in merged.columns):
+        print(f"이미 기사 원문이 분리된 DB입니다: {legacy_path}")
+        return
+
+    con = duckdb.connect(db_path)
+    n_days, n_articles = split_articles(con, merged)
+    con.close()
+    print(f"{n_days}일 / 기사 {n_articles}건 이관 완료: {legacy_path} → {db_path}")
+
+
+if __name__ == "__main__":
+    # python storage.py data/duckdb/250520_weekend_sentiment_stock.duckdb
+    # 이관된 DB label 재계산 : python storage.py --relabel
+    parser = argparse.ArgumentParser()
+    parser.add_argument('legacy_path', nargs='?', help="이관할 기존 weekend DB 경로")
+    parser.add_argument('--relabel', action='store_true', help="이관된 DB label 재계산")
+    args = parser.parse_args()
+
+    if args.relabel:
+        con = connect()
+        print(f"label 변경 : {relabel(con)}행")
+        con.close()
+    elif args.legacy_path:
+        migrate_legacy(args.legacy_path)
+    else:
+        parser.print_usage()
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import time
+import atexit
+import cProfile
+import argparse
+import resource
+import functools
+import threading
+import tracemalloc
+import pandas as pd
+from datetime import datetime
+from contextlib import contextmanager
+
+import storage
+
+# -----------------------------------
+# 설정: 단계별 성능 기록 (wall / CPU / peak RSS / 처리 건수) -> stage_metrics 테이블
+# 프로파일링 : PROFILE_STAGE=news_analyze,save_db python update_today_data.py
+#   -> profiles/{run_id}_{stage}.prof (cProfile) + .tracemalloc (tracemalloc snapshot)
+# -----------------------------------
+PROFILE_STAGES = set(filter(None, os.environ.get("PROFILE_STAGE", "").split(',')))
+PROFILE_DIR = "profiles"
+
+METRICS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stage_metrics (
+        run_id VARCHAR,
+        stage VARCHAR,
+        status VARCHAR,         -- success / failed
+        started_at TIMESTAMP,
+        wall_seconds DOUBLE,
+        cpu_seconds DOUBLE,     -- 프로세스 전체 CPU 시간 (모든 스레드)
+        peak_rss_mb DOUBLE,     -- 단계 실행 중 최대 RSS (동시에 실행된 단계와 공유)
+        counts VARCHAR,         -- 처리 건수 JSON : {"pages": 3, "articles": 250, ...}
+        profile VARCHAR         -- 프로파일 파일 경로 (PROFILE_STAGE 지정 시)
+    )
+"""
+
+_lock = threading.Lock()
+_local = threading.local()
+_active = []        # 실행 중인 모든 단계 (peak RSS 초기화 전에 현재 peak 반영)
+_records = []       # flush 전까지 메모리에 보관 (단계 실행 중 DB 연결 X)
+run_id = None
+enabled = True      # False : 측정만 하고 기록하지 않음 (benchmark.py)
+
+def new_run():
+    # 같은 프로세스에서 여러 번 실행하는 경우 (schedule_run.py) 실행마다 새 run_id
+    global run_id
+    run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    return run_id
+
+new_run()
+
+# -----------------------------------
+# peak RSS : Linux는 /proc/self/status의 VmHWM을 단계마다 초기화해서 측정
+# (초기화할 수 없는 환경에서는 프로세스 시작 이후 최대값)
+# -----------------------------------
+def read_peak_kb():
+    try:
+        with open("/proc/self/status") as f:
+            return int(re.search(r"VmHWM:\s+(\d+)", f.read()).group(1))
+    except (OSError, AttributeError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def count(unit, n):
+    # 현재 스레드에서 실행 중인 가장 안쪽 단계에 처리 건수 누적
+    stack = _stack()
+    if stack:
+        stack[-1]['counts'][unit] = stack[-1]['counts'].get(unit, 0) + int(n)
+
+# -----------------------------------
+# 단계 측정
+# -----------------------------------
+@contextmanager
+def measure(stage):
+    metric = {'stage': stage, 'counts': {}, 'peak_kb': 0}
+    with _lock:
+        current = read_peak_kb()
+        for other in _active:
+            other['peak_kb'] = max(other['peak_kb'], current)
+        reset_peak()
+        _active.append(metric)
+    _stack().append(metric)
+
+    profiler = None
+    if stage in PROFILE_STAGES and not tracemalloc.is_tracing():
+        # cProfile은 현재 스레드만 측정 (바깥 단계가 이미 프로파일링 중이면 그 결과에 포함)
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        profiler.enable()
+
+    status = 'failed'
+    started_at = datetime.now()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield metric
+        status = 'success'
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        profile = dump_profile(stage, profiler) if profiler else None
+
+        _stack().pop()
+        with _lock:
+            _active.remove(metric)
+            peak_kb = max(metric['peak_kb'], read_peak_kb())
+            if enabled:
+                _records.append({
+                    'run_id': run_id, 'stage': stage, 'status': status, 'started_at': started_at,
+                    'wall_seconds': wall, 'cpu_seconds': cpu, 'peak_rss_mb': peak_kb / 1024,
+                    'counts': json.dumps(metric['counts']), 'profile': profile
+                })
+
+def instrument(stage):
+    # 함수 전체를 하나의 단계로 측정하는 decorator
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def dump_profile(stage, profiler):
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{run_id}_{stage}")
+    profiler.dump_stats(path + ".prof")
+    snapshot.dump(path + ".tracemalloc")
+
+    print(f"[profile] {stage} → {path}.prof (python -m pstats), {path}.tracemalloc")
+    for stat in snapshot.statistics('lineno')[:5]:
+        print(f"[profile]   {stat}")
+    return path
+
+# -----------------------------------
+# DB 저장 : 실행 끝에 한 번 (프로세스 종료 시 자동 호출)
+# -----------------------------------
+def flush(db_path=storage.DB_PATH):
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    if not records:
+        return
+
+    try:
+        con = storage.connect(db_path)
+        try:
+            con.execute(METRICS_SCHEMA)
+            con.register("metrics_df", pd.DataFrame(records))
+            con.execute("INSERT INTO stage_metrics BY NAME SELECT * FROM metrics_df")
+            con.unregister("metrics_df")
+        finally:
+            con.close()
+    except Exception as e:
+        # 측정 기록 실패로 본 작업이 실패하지 않도록 출력만
+        print(f"[telemetry] 기록 저장 실패 ({len(records)}건) : {e}")
+
+atexit.register(flush)
+
+# -----------------------------------
+# 실행별 추이 리포트
+# -----------------------------------
+def report(con, stage=None, last=10):
+    # read_only 연결에서도 실행 가능 (테이블 생성 X)
+    if not con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'stage_metrics'").fetchone()[0]:
+        return pd.DataFrame()
+    if stage:
+        # 단계 하나의 최근 실행 기록
+        return con.execute("""
+            SELECT started_at, status, round(wall_seconds, 2) AS wall_s, round(cpu_seconds, 2) AS cpu_s,
+                   round(peak_rss_mb) AS peak_rss_mb, counts
+            FROM stage_metrics WHERE stage = ?
+            ORDER BY started_at DESC LIMIT ?
+        """, [stage, last]).fetchdf()
+
+    # 단계별 최근 실행 vs 이전 실행 평균
+    return con.execute("""
+        WITH ranked AS (
+            SELECT *, row_number() OVER (PARTITION BY stage ORDER BY started_at DESC) AS recency
+            FROM stage_metrics WHERE status = 'success'
+        )
+        SELECT stage,
+               count(*) AS runs,
+               round(any_value(wall_seconds) FILTER (WHERE recency = 1), 2) AS last_wall_s,
+               round(avg(wall_seconds) FILTER (WHERE recency > 1), 2) AS avg_wall_s,
+               round(100 * (any_value(wall_seconds) FILTER (WHERE recency = 1)
+                            / avg(wall_seconds) FILTER (WHERE recency > 1) - 1), 1) AS wall_change_pct,
+               round(any_value(cpu_seconds) FILTER (WHERE recency = 1), 2) AS last_cpu_s,
+               round(max(peak_rss_mb)) AS max_rss_mb,
+               any_value(counts) FILTER (WHERE recency = 1) AS last_counts
+        FROM ranked WHERE recency <= ?
+        GROUP BY stage
+        ORDER BY min(started_at)
+    """, [last]).fetchdf()
+
+
+if __name__ == "__main__":
+    # 단계별 추이 : python telemetry.py [--last 10]
+    # 단계 하나의 실행 기록 : python telemetry.py --stage news_analyze
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stage')
+    parser.add_argument('--last', type=int, default=10, help="비교할 최근 실행 수")
+    args = parser.parse_args()
+
+    con = storage.connect(read_only=True)
+    result = report(con, args.stage, args.last)
+    con.close()
+
+    if result.empty:
+        print("기록된 단계가 없습니다.")
+    else:
+        print(result.to_string(index=False))
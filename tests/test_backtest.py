@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+import real_predict
+from sliding_window import generate_flatten_features, feature_cols
+
+class StaticRegistry :
+    """ DB / 모델 파일 없이 메모리의 데이터와 모델로 백테스트 (ModelRegistry와 같은 속성) """
+    def __init__(self, df, models) :
+        self.df = df
+        self.values = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float64))
+        self.models = {key : (0, model) for key, model in models.items()}
+
+    def refresh(self) :
+        pass
+
+def history(n_days=120, seed=0) :
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((n_days, len(feature_cols))), columns=feature_cols)
+    df.insert(0, 'date', pd.date_range("2025-01-01", periods=n_days).strftime('%Y-%m-%d'))
+    df['label'] = pd.array(rng.integers(0, 2, n_days), dtype='Int64')
+    df.loc[n_days - 1, 'label'] = pd.NA     # 오늘 행
+    return df
+
+def fitted_models(df) :
+    models = {}
+    for window in real_predict.windows :
+        X, y = generate_flatten_features(df, window, feature_cols)
+        labeled = y.notna().to_numpy()
+        models[('decisiontree', window)] = DecisionTreeClassifier(max_depth=4, random_state=0).fit(
+            X[labeled], y[labeled].astype(int))
+    return models
+
+def test_backtest_matches_training_alignment() :
+    df = history()
+    registry = StaticRegistry(df, fitted_models(df))
+    result = real_predict.backtest(registry)
+
+    for window in real_predict.windows :
+        # 학습 입력 행렬의 i번째 행 = 날짜 df['date'][window + i]
+        X, _ = generate_flatten_features(df, window, feature_cols)
+        expected = registry.models[('decisiontree', window)][1].predict_proba(X)[:, 1]
+        dates = df['date'].to_numpy()[window:]
+
+        rows = result[result['window'] == window].set_index('date')
+        assert list(rows.index) == list(dates)
+        np.testing.assert_allclose(rows.loc[dates, 'probability'].to_numpy(), expected)
+
+def test_window_features_matches_backtest_row() :
+    df = history()
+    registry = StaticRegistry(df, fitted_models(df))
+    idx = len(df) - 1
+
+    features = real_predict.window_features(registry.values, idx, real_predict.windows)
+    for window in real_predict.windows :
+        X, _ = generate_flatten_features(df, window, feature_cols)
+        np.testing.assert_array_equal(features[window][0], X.iloc[idx - window].to_numpy())
@@ -0,0 +1,105 @@
+import os
+import json
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+import bigkinds
+
+RESPONSE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "bigkinds_api")
+
+PAGE_1 = [
+    {'date' : '2025-05-02', 'media' : '매일경제',
+     'text' : '삼성전자, 1분기 영업이익 6.7조원' + bigkinds.SEPERATOR + '삼성전자가 1분기 영업이익 6조7000억원을 기록했다. 모바일이 실적을 이끌었다.'},
+    {'date' : '2025-05-02', 'media' : '한국경제',
+     'text' : '삼성전자 HBM 공급 확대 기대' + bigkinds.SEPERATOR + '고대역폭메모리 공급 확대 기대감이 커지고 있다.'},
+]
+# 검색 조건 외 언론사(머니투데이) 기사는 제외
+PAGE_2 = [
+    {'date' : '2025-05-03', 'media' : '서울경제',
+     'text' : '삼성전자, 파운드리 고객사 추가 확보' + bigkinds.SEPERATOR + '파운드리 사업부가 신규 고객사를 확보했다.'},
+]
+PAGE_3 = [
+    {'date' : '2025-05-05', 'media' : '아주경제',
+     'text' : '외국인, 삼성전자 순매수 전환' + bigkinds.SEPERATOR + '외국인 투자자가 삼성전자를 순매수했다. 코스피는 강보합 마감했다.'},
+]
+
+class StubServer :
+    """ 검색 API 응답 fixture(page_{startNo}.json, 직접 작성) 재생 : 지정 페이지는 처음 몇 번 503, 페이지별 응답 지연 """
+    def __init__(self, fail_pages=None, delays=None) :
+        self.fail_pages = dict(fail_pages or {})   # page -> 503 응답 횟수
+        self.delays = delays or {}                  # page -> 응답 지연 (초)
+        self.requests = []
+
+    async def search(self, request) :
+        page = (await request.json())['startNo']
+        self.requests.append(page)
+        if self.fail_pages.get(page) :
+            self.fail_pages[page] -= 1
+            return web.Response(status=503)
+
+        await asyncio.sleep(self.delays.get(page, 0))
+        with open(os.path.join(RESPONSE_DIR, f"page_{page}.json"), encoding="utf-8") as f :
+            return web.json_response(json.load(f))
+
+    def start(self) :
+        # iter_pages가 자체 event loop를 사용하므로 stub 서버는 별도 스레드의 loop에서 실행
+        self.loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_post("/api/news/search.do", self.search)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        return f"http://127.0.0.1:{port}/api/news/search.do"
+
+    def stop(self) :
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+@pytest.fixture
+def stub(monkeypatch) :
+    monkeypatch.setattr(bigkinds, "BACKOFF", 0.01)
+    servers = []
+
+    def start(**kwargs) :
+        server = StubServer(**kwargs)
+        servers.append(server)
+        return server, server.start()
+
+    yield start
+    for server in servers :
+        server.stop()
+
+def test_retry_on_503(stub) :
+    server, url = stub(fail_pages={1 : 2})
+    pages = list(bigkinds.iter_pages("2025-05-02", "2025-05-05", api_url=url))
+
+    assert [page for page, _, _ in pages] == [1, 2, 3]
+    assert pages[0] == (1, 3, PAGE_1)
+    assert server.requests.count(1) == 3        # 503 두 번 후 성공
+
+def test_retry_gives_up(stub) :
+    _, url = stub(fail_pages={1 : bigkinds.MAX_RETRIES + 1})
+    with pytest.raises(RuntimeError, match="1 페이지 요청 실패") :
+        list(bigkinds.iter_pages("2025-05-02", "2025-05-05", api_url=url))
+
+def test_page_order_with_concurrency(stub) :
+    # 2 페이지 응답이 3 페이지보다 늦게 도착해도 페이지 순서대로 반환
+    server, url = stub(delays={2 : 0.3})
+    pages = list(bigkinds.iter_pages("2025-05-02", "2025-05-05", concurrency=3, api_url=url))
+
+    assert pages == [(1, 3, PAGE_1), (2, 3, PAGE_2), (3, 3, PAGE_3)]
+    assert sorted(server.requests) == [1, 2, 3]
+
+def test_resume_from_first_page(stub) :
+    # checkpoint 이후 페이지부터 : 이전 페이지는 요청하지 않음
+    server, url = stub()
+    pages = list(bigkinds.iter_pages("2025-05-02", "2025-05-05", first_page=2, concurrency=2, api_url=url))
+
+    assert pages == [(2, 3, PAGE_2), (3, 3, PAGE_3)]
+    assert sorted(server.requests) == [2, 3]
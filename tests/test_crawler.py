@@ -0,0 +1,128 @@
+import os
+import re
+import shutil
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pandas as pd
+import pytest
+
+import storage
+import update_today_data
+from bigkinds import SEPERATOR
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+RESULT_PAGE = os.path.join(FIXTURE_DIR, "bigkinds_results.html")
+
+# 브라우저 end-to-end 테스트 : 로컬에 Chrome / chromedriver가 없으면 건너뜀 (selenium-manager 다운로드 X)
+needs_browser = pytest.mark.skipif(
+    not (shutil.which("chromedriver") and any(shutil.which(name) for name in
+                                              ["google-chrome", "chromium", "chromium-browser", "chrome"])),
+    reason="Chrome / chromedriver 필요")
+
+PAGE_1 = [
+    {'date' : '2025-05-02', 'media' : '매일경제',
+     'text' : '삼성전자, 1분기 영업이익 6.7조원' + SEPERATOR
+              + '삼성전자가 1분기 영업이익 6조7000억원을 기록했다. 반도체 부문은 부진했지만 모바일이 실적을 이끌었다.'},
+    # 마지막 줄이 '..'로 끝나면 버림
+    {'date' : '2025-05-02', 'media' : '한국경제',
+     'text' : '삼성전자 HBM 공급 확대 기대' + SEPERATOR + '고대역폭메모리 공급 확대 기대감이 커지고 있다.'},
+    # 언론사 표시 없음
+    {'date' : '2025-05-03', 'media' : None,
+     'text' : '삼성전자 주주총회 안건 공개' + SEPERATOR + '삼성전자가 임시 주주총회 안건을 공개했다.'},
+]
+PAGE_2 = [
+    {'date' : '2025-05-04', 'media' : '서울경제',
+     'text' : '삼성전자, 파운드리 고객사 추가 확보' + SEPERATOR + '파운드리 사업부가 신규 고객사를 확보했다.'},
+    {'date' : '2025-05-05', 'media' : '아주경제',
+     'text' : '외국인, 삼성전자 순매수 전환' + SEPERATOR + '외국인 투자자가 삼성전자를 순매수했다. 코스피는 강보합 마감했다.'},
+]
+
+# -----------------------------------
+# 브라우저 없이 : 결과 페이지 HTML을 직접 파싱해서 PARSE_PAGE_JS와 같은 값을 돌려주는 driver
+# -----------------------------------
+class FakeDriver :
+    def __init__(self, page) :
+        bs4 = pytest.importorskip("bs4")
+        with open(RESULT_PAGE, encoding="utf-8") as f :
+            soup = bs4.BeautifulSoup(f.read(), "html.parser")
+
+        # 결과 목록 = 페이지 template 내용 (브라우저에서는 스크립트가 innerHTML로 복사)
+        content = bs4.BeautifulSoup(soup.select_one(f"#page-{page}").decode_contents(), "html.parser")
+        soup.select_one("#news-results").extend(list(content.children))
+        self.soup = soup
+
+    def execute_script(self, script) :
+        assert script == update_today_data.PARSE_PAGE_JS
+        # 스크립트의 selector를 그대로 사용 : 목록, 링크, 제목, 요약, 날짜, 언론사 순
+        items, link, title, summary, date, provider = re.findall(r"querySelector(?:All)?\('([^']+)'\)", script)
+
+        parsed = []
+        for item in self.soup.select(items) :
+            link_el = item.select_one(link)
+            title_el = link_el.select_one(title) if link_el else None
+            summary_el = link_el.select_one(summary) if link_el else None
+            date_el = item.select_one(date)
+            provider_el = item.select_one(provider)
+            parsed.append({
+                'title' : title_el.get_text() if title_el else '',
+                'summary' : summary_el.decode_contents() if summary_el else '',
+                'date' : date_el.get_text().strip() if date_el else '',
+                'media' : provider_el.get_text().strip() if provider_el else None
+            })
+        return parsed
+
+@pytest.mark.parametrize("page, expected", [(1, PAGE_1), (2, PAGE_2)])
+def test_parse_page_records(page, expected) :
+    assert update_today_data.parse_page(FakeDriver(page)) == expected
+
+def test_to_articles() :
+    pages = [pd.DataFrame(update_today_data.parse_page(FakeDriver(page))) for page in (1, 2)]
+    articles = update_today_data.to_articles(pages)
+
+    assert list(articles.columns) == storage.ARTICLE_COLS
+    assert articles['date'].tolist() == ['2025-05-02', '2025-05-02', '2025-05-03', '2025-05-04', '2025-05-05']
+    # 날짜별 기사 순번
+    assert articles['seq'].tolist() == [1, 2, 1, 1, 1]
+    assert articles['text'].tolist() == [record['text'] for record in PAGE_1 + PAGE_2]
+    assert articles['hash'].tolist() == [storage.article_hash(record['text']) for record in PAGE_1 + PAGE_2]
+    assert articles['media'].isna().tolist() == [False, False, True, False, False]
+
+# -----------------------------------
+# 브라우저 end-to-end : 로컬 http 서버 + 명시적 대기 + 페이지 이동
+# -----------------------------------
+@pytest.fixture
+def result_page(monkeypatch) :
+    # 저장해 둔 결과 페이지를 로컬 http 서버로 제공 -> --base-url과 같은 방식으로 BIGKINDS_URL 변경
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=FIXTURE_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(update_today_data, "BIGKINDS_URL", f"http://127.0.0.1:{server.server_port}/bigkinds_results.html")
+    monkeypatch.setattr(update_today_data, "HEADLESS", True)
+    monkeypatch.setattr(update_today_data, "WAIT_TIMEOUT", 10)
+    yield
+    server.shutdown()
+    server.server_close()
+
+@needs_browser
+def test_parse_page(result_page) :
+    # 검색 조건 입력 -> 결과 교체 / 로딩 대기 -> 첫 페이지 파싱
+    driver = update_today_data.open_search("2025-05-02", "2025-05-05")
+    try :
+        assert update_today_data.parse_page(driver) == PAGE_1
+    finally :
+        driver.quit()
+
+@needs_browser
+def test_selenium_pages(result_page) :
+    pages = list(update_today_data.selenium_pages("2025-05-02", "2025-05-05"))
+    assert pages == [(1, 2, PAGE_1), (2, 2, PAGE_2)]
+
+@needs_browser
+def test_selenium_pages_resume(result_page) :
+    # checkpoint 이후 페이지부터 (페이지 번호 입력으로 이동)
+    pages = list(update_today_data.selenium_pages("2025-05-02", "2025-05-05", first_page=2))
+    assert pages == [(2, 2, PAGE_2)]
@@ -0,0 +1,33 @@
+import pandas as pd
+
+import storage
+
+def merged_row(date, close, label=None) :
+    return {'date' : date, 'news_count' : 1, 'avg_negative' : 0.2, 'avg_neutral' : 0.6, 'avg_positive' : 0.2,
+            'open' : close, 'high' : close, 'low' : close, 'close' : close, 'volume' : 100.0, 'label' : label}
+
+def test_upsert_middle_day_refreshes_following_rows(tmp_path) :
+    # 목(5/15) / 토 / 일 / 월(5/19) 이력 사이에 금(5/16) 삽입
+    # -> 주말 행 주가는 금요일 값, 주말 label은 월요일 종가 > 금요일 종가
+    con = storage.connect(str(tmp_path / "test.duckdb"))
+    history = pd.DataFrame([merged_row('2025-05-15', 100.0, 0), merged_row('2025-05-17', 100.0, 0),
+                            merged_row('2025-05-18', 100.0, 0), merged_row('2025-05-19', 90.0)])
+    con.register("history", history)
+    con.execute("INSERT INTO merged_data BY NAME SELECT * FROM history")
+
+    storage.upsert_days(con, pd.DataFrame([merged_row('2025-05-16', 80.0)]))
+
+    merged = storage.load_merged(con).set_index('date')
+    assert merged.loc['2025-05-16', 'label'] == 1
+    assert merged.loc['2025-05-15', 'label'] == 0
+    for weekend in ['2025-05-17', '2025-05-18'] :
+        assert merged.loc[weekend, 'close'] == 80.0
+        assert merged.loc[weekend, 'label'] == 1
+    assert merged.loc['2025-05-19', 'close'] == 90.0
+    assert pd.isna(merged.loc['2025-05-19', 'label'])
+
+    # 파생 피처도 갱신된 주말 주가 기준
+    features = con.execute("SELECT * FROM features WHERE date >= '2025-05-16' ORDER BY date").fetchdf()
+    assert features['date'].tolist() == ['2025-05-16', '2025-05-17', '2025-05-18', '2025-05-19']
+    assert features['close_diff'].tolist() == [-20.0, 0.0, 0.0, 10.0]
+    con.close()
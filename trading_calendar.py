@@ -0,0 +1,106 @@
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+
+# -----------------------------------
+# 설정: KRX 휴장일 (주말 제외, 평일 휴장일만)
+# 신정, 설날/추석 연휴, 삼일절, 근로자의 날, 어린이날, 부처님오신날, 현충일, 광복절,
+# 개천절, 한글날, 성탄절, 선거일, 대체/임시공휴일, 연말 휴장일
+# 매년 KRX 휴장일 공지 확인 후 다음 해 목록 추가
+# -----------------------------------
+KRX_HOLIDAYS = {
+    2021 : ['01-01', '02-11', '02-12', '03-01', '05-05', '05-19', '08-16', '09-20', '09-21', '09-22',
+            '10-04', '10-11', '12-31'],
+    2022 : ['01-31', '02-01', '02-02', '03-01', '03-09', '05-05', '06-01', '06-06', '08-15', '09-09',
+            '09-12', '10-03', '10-10', '12-30'],
+    2023 : ['01-23', '01-24', '03-01', '05-01', '05-05', '05-29', '06-06', '08-15', '09-28', '09-29',
+            '10-02', '10-03', '10-09', '12-25', '12-29'],
+    2024 : ['01-01', '02-09', '02-12', '03-01', '04-10', '05-01', '05-06', '05-15', '06-06', '08-15',
+            '09-16', '09-17', '09-18', '10-01', '10-03', '10-09', '12-25', '12-31'],
+    2025 : ['01-01', '01-27', '01-28', '01-29', '01-30', '03-03', '05-01', '05-05', '05-06', '06-03',
+            '06-06', '08-15', '10-03', '10-06', '10-07', '10-08', '10-09', '12-25', '12-31'],
+    2026 : ['01-01', '02-16', '02-17', '02-18', '03-02', '05-01', '05-05', '05-25', '06-03', '08-17',
+            '09-24', '09-25', '10-05', '10-09', '12-25', '12-31'],
+}
+
+FIRST_YEAR, LAST_YEAR = min(KRX_HOLIDAYS), max(KRX_HOLIDAYS)
+HOLIDAYS = np.array([f"{year}-{day}" for year, days in KRX_HOLIDAYS.items() for day in days], dtype='datetime64[D]')
+
+# 월~금 거래, 주말 + 휴장일 제외 (numpy 영업일 계산 : 반복문 없이 배열 단위로 처리)
+KRX = np.busdaycalendar(weekmask='1111100', holidays=HOLIDAYS)
+
+def to_days(dates) :
+    # 'YYYY-MM-DD' 문자열 / Timestamp / 배열 -> datetime64[D] 배열
+    days = np.asarray(dates, dtype='datetime64[D]')
+    years = days.astype('datetime64[Y]').astype(int) + 1970
+    if years.size and (years.min() < FIRST_YEAR or years.max() > LAST_YEAR) :
+        # 목록 범위 밖은 주말만 휴장으로 처리
+        warnings.warn(f"KRX 휴장일 목록 범위({FIRST_YEAR}~{LAST_YEAR}) 밖의 날짜는 주말만 휴장일로 처리합니다")
+    return days
+
+def to_str(days) :
+    return np.datetime_as_string(days, unit='D')
+
+# -----------------------------------
+# 거래일 조회 (벡터화)
+# -----------------------------------
+def is_trading_day(dates) :
+    return np.is_busday(to_days(dates), busdaycal=KRX)
+
+def is_holiday(dates) :
+    # 평일 휴장일 (주말 제외)
+    days = to_days(dates)
+    return np.isin(days, HOLIDAYS)
+
+def next_trading_day(dates) :
+    # 해당 날짜 "이후" 첫 거래일 (당일 제외)
+    return to_str(np.busday_offset(to_days(dates), 1, roll='backward', busdaycal=KRX))
+
+def prev_trading_day(dates) :
+    # 해당 날짜 "이전" 마지막 거래일 (당일 제외)
+    return to_str(np.busday_offset(to_days(dates), -1, roll='forward', busdaycal=KRX))
+
+def trading_days(start, end) :
+    # start ~ end (양 끝 포함) 거래일 문자열 배열
+    days = np.arange(to_days(start), to_days(end) + 1, dtype='datetime64[D]')
+    return to_str(days[np.is_busday(days, busdaycal=KRX)])
+
+def count_trading_days(start, end) :
+    return int(np.busday_count(to_days(start), to_days(end) + 1, busdaycal=KRX))
+
+# -----------------------------------
+# 데이터셋 처리 : forward fill / label / 주말 미포함(weekday) 분리
+# -----------------------------------
+PRICE_COLS = ['open', 'high', 'low', 'close', 'volume']
+
+def ffill_prices(df) :
+    """ 비거래일(주말, 공휴일) 행을 직전 거래일 주가로 채움 """
+    df = df.sort_values('date').reset_index(drop=True)
+    trading = is_trading_day(df['date'])
+
+    # 거래일인데 주가가 없는 경우 (데이터 제공처 누락) : 직전 값 사용, 날짜 출력
+    gaps = df.loc[trading & df['close'].isna().to_numpy(), 'date']
+    if len(gaps) :
+        print(f"거래일 주가 누락 -> 직전 거래일 값 사용 : {', '.join(gaps)}")
+
+    df[PRICE_COLS] = df[PRICE_COLS].ffill()
+    return df
+
+def label_next_trading_day(df) :
+    """ label = 다음 거래일 종가 > 해당 날짜 종가 (다음 거래일 데이터가 없으면 NaN) """
+    close_by_date = df.set_index('date')['close']
+    next_close = close_by_date.reindex(next_trading_day(df['date'])).to_numpy()
+    return pd.Series((next_close > df['close'].to_numpy()).astype(float), index=df.index).where(
+        ~np.isnan(next_close) & df['close'].notna().to_numpy()).astype('Int64')
+
+def weekday_rows(df) :
+    """ 주말 포함(weekend) 데이터 -> 거래일 행만 남긴 weekday 데이터 (yfinance inner join 대체) """
+    return df[is_trading_day(df['date'])].reset_index(drop=True)
+
+
+if __name__ == "__main__" :
+    # 기간 거래일 확인 : python trading_calendar.py 2025-05-01 2025-05-31
+    days = trading_days(sys.argv[1], sys.argv[2])
+    print(f"{sys.argv[1]} ~ {sys.argv[2]} 거래일 {len(days)}일")
+    print(', '.join(days))
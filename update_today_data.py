@@ -1,361 +1,349 @@
-import sys
+import os
 import time
-import duckdb
+import argparse
 import numpy as np
 import pandas as pd
-import torch
-import yfinance as yf
-from tqdm import tqdm
-from datetime import datetime, timedelta
-from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from torch.nn.functional import softmax
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from sentiment_engine import get_scorer, daily_sentiment_stream
+import sentiment_engine
+from bigkinds import SEPERATOR, clean_summary
+import bigkinds
+import prices
+import storage
+import trading_calendar
+import telemetry
+from pipeline import frame_fingerprint
 
 # -----------------------------------
-# 1. 뉴스 크롤링
+# 단계별 소요 시간 측정
 # -----------------------------------
-def crawl_news(date) :
-    # webdriver 연동
-    driver = webdriver.Chrome()
-    driver.get("https://www.bigkinds.or.kr/v2/news/index.do")
-
-    ## 언론사 필터링
-    find_media = ['매일경제', '서울경제', '아주경제', '한국경제']
-    media_list = driver.find_element(By.CSS_SELECTOR, "#category_provider_list > li")
-    for media in media_list :
-        label = media.find_element(By.CSS_SELECTOR, "span > label")
-        label_text = label.text.strip()
-        if label_text in find_media :
-            driver.execute_script("arguments[0].click();", label)
-        else :
-            continue
-
-    ## 기간 설정
-    duration_news = driver.find_element(By.CSS_SELECTOR, "#collapse-step-1-body > div.srch-detail.v2 > div > div.tab-btn-wp1 > div.tab-btn-inner.tab1 > a")
-    duration_news.click()
-
-    time.sleep(0.5)
-
-    # 기간 직접 입력
-    start_date = driver.find_element(By.CSS_SELECTOR, "#search-begin-date")
-    start_date.send_keys(Keys.COMMAND + "a")
-    time.sleep(1)
-    start_date.send_keys(Keys.DELETE)
-    time.sleep(0.2)
-    start_date.send_keys(date)
-    time.sleep(1)
-
-    end_date = driver.find_element(By.CSS_SELECTOR, "#search-end-date")
-    end_date.send_keys(Keys.COMMAND + "a")
-    time.sleep(1)
-    end_date.send_keys(Keys.DELETE)
-    time.sleep(0.2)
-    end_date.send_keys(date)
-    time.sleep(0.5)
-    end_date.send_keys(Keys.ENTER)
-
-    ## 카테고리 필터링 : 경제, 국제, IT_과학
-    general_category = driver.find_element(By.CSS_SELECTOR, "#collapse-step-1-body > div.srch-detail.v2 > div > div.tab-btn-wp2 > div.tab-btn-inner.tab3 > a")
-    general_category.click()
-
-    # 경제, 국제, IT_과학 체크박스 클릭
-    economy_checkbox = driver.find_element(By.CSS_SELECTOR, "#srch-tab3 > ul > li:nth-child(2) > div > span:nth-child(3)")
-    economy_checkbox.click()
-
-    world_checkbox = driver.find_element(By.CSS_SELECTOR, "#srch-tab3 > ul > li:nth-child(5) > div > span:nth-child(3)")
-    world_checkbox.click()
-
-    it_checkbox = driver.find_element(By.CSS_SELECTOR, "#srch-tab3 > ul > li:nth-child(8) > div > span:nth-child(3)")
-    it_checkbox.click()
-
-    ## 상세검색 조건 설정
-    detail_search = driver.find_element(By.CSS_SELECTOR, "#collapse-step-1-body > div.srch-detail.v2 > div > div.tab-btn-wp3 > div.tab-btn-inner.tab5 > a")
-    detail_search.click()
-
-    # 검색어 범위 설정
-    search_range = driver.find_element(By.CSS_SELECTOR, "#search-scope-type")
-    search_range.click()
-
-    # 제목 검색 설정
-    filter_title = driver.find_element(By.CSS_SELECTOR, "#search-scope-type > option:nth-child(2)")
-    filter_title.click()
-
-    # 단어 중 1개 이상 포함 : "삼성전자"
-    filter_samsung = driver.find_element(By.CSS_SELECTOR, "#orKeyword1")
-    filter_samsung.send_keys("삼성전자")
-
-    # 제외 단어 설정
-    filter_except = driver.find_element(By.CSS_SELECTOR, "#notKeyword1")
-    filter_except.send_keys("[속보] OR [스팟] OR 칼럼")
-
-    ## 최종 검색 버튼 클릭
-    search_btn = driver.find_element(By.CSS_SELECTOR, "#detailSrch1 > div.srch-foot > div > button.btn.btn-md.btn-primary.news-search-btn")
-    search_btn.click()
-
-    time.sleep(5)
-
-    ## 분석 기사 클릭
-    label = driver.find_element(By.CSS_SELECTOR, 'label[for="filter-tm-use"]')
-
-    # JS로 강제 클릭 (보통 이게 가장 확실함)
-    driver.execute_script("arguments[0].click();", label)
-
-    time.sleep(5)
-
-    ## 보기 정렬 : 과거순
-    sort_articles = driver.find_element(By.CSS_SELECTOR, "#select1")
-    sort_articles.click()
-
-    sort_ascending = driver.find_element(By.CSS_SELECTOR, "#select1 > option:nth-child(3)")
-    sort_ascending.click()
-
-    time.sleep(5)
-
-    ## 보기 개수 : 100개
-    view_articles = driver.find_element(By.CSS_SELECTOR, "#select2")
-    view_articles.click()
-
-    view_hunnit = driver.find_element(By.CSS_SELECTOR, "#select2 > option:nth-child(4)")
-    view_hunnit.click()
-
-    time.sleep(5)
-
-    ## 뉴스 크롤링
-    # 전체 보기 페이지 개수
-    total_page = int(driver.find_element(By.CSS_SELECTOR, "#news-results-tab > div.data-result-btm.m-only.paging-v3-wrp > div.btm-pav-wrp > div > div > div > div:nth-child(6) > div").text)
-    news_by_date = defaultdict(list)
+stage_times = {}
+crawl_times = {}    # 크롤링 세부 단계 (crawl+sentiment 안에 포함)
+run_started = time.perf_counter()
+
+def reset_stage_times() :
+    # 같은 프로세스에서 여러 번 실행하는 경우 (schedule_run.py) 실행마다 초기화
+    global run_started
+    stage_times.clear()
+    crawl_times.clear()
+    run_started = time.perf_counter()
+
+@contextmanager
+def timed(stage, times=stage_times) :
+    start = time.perf_counter()
+    try :
+        yield
+    finally :
+        times[stage] = times.get(stage, 0.0) + time.perf_counter() - start
+
+def print_stage_times() :
+    print("--- 단계별 소요 시간 ---")
+    for stage, elapsed in stage_times.items() :
+        print(f"{stage:>10} : {elapsed:8.2f}s")
+    # 단계 합계 : 동시에 실행된 단계(crawl / price)는 겹쳐서 더해짐 -> 실제 경과 시간은 elapsed
+    print(f"{'sum':>10} : {sum(stage_times.values()):8.2f}s")
+    print(f"{'elapsed':>10} : {time.perf_counter() - run_started:8.2f}s")
+
+    if crawl_times :
+        print("--- 크롤링 세부 소요 시간 ---")
+        for step, elapsed in crawl_times.items() :
+            print(f"{step:>14} : {elapsed:8.2f}s")
+
+def date_range(start, end) :
+    # start ~ end (양 끝 포함) 날짜 문자열 리스트
+    return pd.date_range(start, end).strftime('%Y-%m-%d').tolist()
 
-    for i in range(1, total_page+1) :
-        print(f"=========={i} 페이지 뉴스 기사 크롤링 시작==========")
-        
-        # 한 페이지 전체 뉴스 기사 리스트
-        article_list = driver.find_elements(By.CSS_SELECTOR, "#news-results > div")
-        
-        for j in range(1, len(article_list)+1) :
-            tmp_article = driver.find_element(By.CSS_SELECTOR, f"#news-results > div:nth-child({j}) > div > div.cont > a")
+# -----------------------------------
+# 1. 뉴스 크롤링 : start ~ end 기간을 한 번의 검색으로 수집
+# -----------------------------------
+# 로컬에 저장한 결과 페이지로 실행할 때는 BIGKINDS_URL 또는 --base-url로 변경
+BIGKINDS_URL = os.environ.get("BIGKINDS_URL", "https://www.bigkinds.or.kr/v2/news/index.do")
+# 수집 방식 : selenium (브라우저) / http (bigkinds.py, 검색 API 직접 요청)
+COLLECTORS = ['selenium', 'http']
+COLLECTOR = os.environ.get("NEWS_COLLECTOR", "selenium")
+WAIT_TIMEOUT = 200
+HEADLESS = bool(os.environ.get("CRAWLER_HEADLESS"))     # 화면 없는 서버 / 테스트 실행용
+LOADER_SELECTOR = "#collapse-step-2-body > div > div.data-result.loading-cont > div.news-loader.loading > div"
+RESULT_SELECTOR = "#news-results > div"
+PAGING_SELECTOR = "#news-results-tab > div.data-result-btm.m-only.paging-v3-wrp > div.btm-pav-wrp > div > div > div"
+TOTAL_PAGE_SELECTOR = PAGING_SELECTOR + " > div:nth-child(6) > div"
+NEXT_PAGE_SELECTOR = PAGING_SELECTOR + " > div:nth-child(7) > a"
+
+# 결과 페이지 전체 기사를 한 번의 스크립트 호출로 추출 (기사마다 find_element 왕복 X)
+PARSE_PAGE_JS = """
+return Array.from(document.querySelectorAll('#news-results > div')).map(function (item) {
+    var link = item.querySelector('div > div.cont > a');
+    var title = link && link.querySelector('span');
+    var summary = link && link.querySelector('p');
+    var date = item.querySelector('div > div.cont > div > p:nth-child(2)');
+    var provider = item.querySelector('div > div.cont > div > a.provider');
+    return {
+        title : title ? title.innerText : '',
+        summary : summary ? summary.innerHTML : '',
+        date : date ? date.innerText.trim() : '',
+        media : provider ? provider.innerText.trim() : null
+    };
+});
+"""
+
+def new_driver() :
+    options = webdriver.ChromeOptions()
+    if HEADLESS :
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+    return webdriver.Chrome(options=options)
+
+def wait_for(driver, condition, timeout=None) :
+    return WebDriverWait(driver, timeout or WAIT_TIMEOUT).until(condition)
+
+def wait_clickable(driver, selector) :
+    return wait_for(driver, EC.element_to_be_clickable((By.CSS_SELECTOR, selector)))
+
+def wait_loading(driver) :
+    wait_for(driver, EC.invisibility_of_element_located((By.CSS_SELECTOR, LOADER_SELECTOR)))
+
+def reload_results(driver, action) :
+    # 검색 조건 변경 -> 기존 결과가 교체되고 로딩이 끝날 때까지 대기 (고정 sleep 대신)
+    old_results = driver.find_elements(By.CSS_SELECTOR, RESULT_SELECTOR)
+    action()
+    if old_results :
+        wait_for(driver, EC.staleness_of(old_results[0]))
+    wait_loading(driver)
+    wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, RESULT_SELECTOR)))
+
+def set_date(driver, selector, value) :
+    date_input = wait_clickable(driver, selector)
+    date_input.clear()
+    date_input.send_keys(value)
+    return date_input
+
+def click(driver, selector, js=False) :
+    element = wait_clickable(driver, selector)
+    if js :
+        driver.execute_script("arguments[0].click();", element)
+    else :
+        element.click()
+    return element
 
-            # 기사 제목
-            title = tmp_article.find_element(By.TAG_NAME, "span").text
-            # 본문
-            summary_element = tmp_article.find_element(By.TAG_NAME, "p")
-            summary_html = summary_element.get_attribute("innerHTML")
+def open_search(start, end, base_url=None) :
+    # webdriver 연동
+    with timed('open', crawl_times) :
+        driver = new_driver()
+        driver.get(base_url or BIGKINDS_URL)
+        wait_for(driver, EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#category_provider_list > li")))
+
+    with timed('filters', crawl_times) :
+        ## 언론사 필터링
+        find_media = ['매일경제', '서울경제', '아주경제', '한국경제']
+        media_list = driver.find_elements(By.CSS_SELECTOR, "#category_provider_list > li")
+        for media in media_list :
+            label = media.find_element(By.CSS_SELECTOR, "span > label")
+            label_text = label.text.strip()
+            if label_text in find_media :
+                driver.execute_script("arguments[0].click();", label)
+            else :
+                continue
+
+        ## 기간 설정
+        click(driver, "#collapse-step-1-body > div.srch-detail.v2 > div > div.tab-btn-wp1 > div.tab-btn-inner.tab1 > a")
+
+        # 기간 직접 입력
+        set_date(driver, "#search-begin-date", start)
+        end_date = set_date(driver, "#search-end-date", end)
+        end_date.send_keys(Keys.ENTER)
+
+        ## 카테고리 필터링 : 경제, 국제, IT_과학
+        click(driver, "#collapse-step-1-body > div.srch-detail.v2 > div > div.tab-btn-wp2 > div.tab-btn-inner.tab3 > a")
+
+        # 경제, 국제, IT_과학 체크박스 클릭
+        click(driver, "#srch-tab3 > ul > li:nth-child(2) > div > span:nth-child(3)")
+        click(driver, "#srch-tab3 > ul > li:nth-child(5) > div > span:nth-child(3)")
+        click(driver, "#srch-tab3 > ul > li:nth-child(8) > div > span:nth-child(3)")
+
+        ## 상세검색 조건 설정
+        click(driver, "#collapse-step-1-body > div.srch-detail.v2 > div > div.tab-btn-wp3 > div.tab-btn-inner.tab5 > a")
+
+        # 검색어 범위 설정 : 제목 검색
+        click(driver, "#search-scope-type")
+        click(driver, "#search-scope-type > option:nth-child(2)")
+
+        # 단어 중 1개 이상 포함 : "삼성전자"
+        wait_clickable(driver, "#orKeyword1").send_keys("삼성전자")
+
+        # 제외 단어 설정
+        wait_clickable(driver, "#notKeyword1").send_keys("[속보] OR [스팟] OR 칼럼")
 
-            # <br>를 줄바꿈 문자로 변환
-            parts = summary_html.replace('<br>', '\n').replace('<br/>', '\n').split('\n')
+    ## 최종 검색 버튼 클릭
+    with timed('search', crawl_times) :
+        reload_results(driver, lambda : click(driver, "#detailSrch1 > div.srch-foot > div > button.btn.btn-md.btn-primary.news-search-btn"))
 
-            # 각 줄 공백 정리
-            parts = [part.strip() for part in parts if part.strip()]
+    with timed('result options', crawl_times) :
+        ## 분석 기사 클릭 (JS로 강제 클릭)
+        reload_results(driver, lambda : click(driver, 'label[for="filter-tm-use"]', js=True))
 
-            # 마지막 줄 점검
-            if parts and '..' in parts[-1]:
-                parts = parts[:-1]  # 마지막 문장이 ".." 포함이면 버림
+        ## 보기 정렬 : 과거순
+        click(driver, "#select1")
+        reload_results(driver, lambda : click(driver, "#select1 > option:nth-child(3)"))
 
-            # 최종 텍스트 생성
-            summary_text = ' '.join(parts)
+        ## 보기 개수 : 100개
+        click(driver, "#select2")
+        reload_results(driver, lambda : click(driver, "#select2 > option:nth-child(4)"))
 
-            # 제목 + 구분자 + 본문
-            SEPERATOR = " ||| "
-            final_article = title + SEPERATOR + summary_text
+    return driver
 
-            # 날짜
-            dt = driver.find_element(By.CSS_SELECTOR, f"#news-results > div:nth-child({j}) > div > div.cont > div > p:nth-child(2)").text
-            # datetime 객체로 변환
-            date = datetime.strptime(dt, '%Y/%m/%d')
+def go_to_page(driver, page) :
+    # 페이지 이동 : 입력창에 페이지 번호 직접 입력
+    def submit() :
+        page_input = wait_clickable(driver, "#paging_news_result")
+        page_input.clear()
+        page_input.send_keys(str(page))
+        page_input.send_keys(Keys.ENTER)
 
-            # 원하는 형식의 문자열로 변환
-            article_date = date.strftime('%Y-%m-%d')
+    reload_results(driver, submit)
 
-            # 딕셔너리 저장
-            news_by_date[date].append(final_article)
+def parse_page(driver) :
+    # 한 페이지 전체 뉴스 기사 리스트 -> [{'date', 'media', 'text'}, ...]
+    with timed('parse', crawl_times) :
+        items = driver.execute_script(PARSE_PAGE_JS)
 
-        # 현재 페이지
-        current_input = driver.find_element(By.CSS_SELECTOR, "#paging_news_result")
-        current_page = int(current_input.get_attribute("value"))
+    records = []
+    for item in items :
+        # 제목 + 구분자 + 본문
+        final_article = item['title'] + SEPERATOR + clean_summary(item['summary'])
 
-        if current_page == total_page :
-            print("마지막 페이지에 도달했습니다.")
-            break
+        # datetime 객체로 변환 후 원하는 형식의 문자열로 변환
+        article_date = datetime.strptime(item['date'], '%Y/%m/%d').strftime('%Y-%m-%d')
 
-        # 다음 페이지 : 입력창에 페이지 번호 직접 입력
-        next_button = driver.find_element(By.CSS_SELECTOR, "#news-results-tab > div.data-result-btm.m-only.paging-v3-wrp > div.btm-pav-wrp > div > div > div > div:nth-child(7) > a")
-        driver.execute_script("arguments[0].click();", next_button)
+        # 기사 1건 = 1행 (long 형식), 언론사 없으면 None
+        records.append({'date' : article_date, 'media' : item['media'], 'text' : final_article})
 
-        WebDriverWait(driver, 200).until(EC.invisibility_of_element_located((By.CSS_SELECTOR, "#collapse-step-2-body > div > div.data-result.loading-cont > div.news-loader.loading > div")))
+    return records
 
-        new_input = driver.find_element(By.CSS_SELECTOR, "#paging_news_result")
-        new_page = int(new_input.get_attribute("value"))
+# -----------------------------------
+# 수집 방식별 페이지 생성 : (page, total_page, records)를 first_page부터 순서대로 반환
+# -----------------------------------
+def selenium_pages(start, end, first_page=1) :
+    driver = open_search(start, end)
+    try :
+        # 전체 보기 페이지 개수
+        total_page = int(driver.find_element(By.CSS_SELECTOR, TOTAL_PAGE_SELECTOR).text)
+
+        page = first_page
+        if page > 1 :
+            with timed('next page', crawl_times) :
+                go_to_page(driver, page)
+
+        while page <= total_page :
+            yield page, total_page, parse_page(driver)
+
+            if page == total_page :
+                break
+
+            # 다음 페이지
+            with timed('next page', crawl_times) :
+                reload_results(driver, lambda : click(driver, NEXT_PAGE_SELECTOR, js=True))
+            page += 1
+    finally :
+        driver.quit()
+
+def http_pages(start, end, first_page=1) :
+    pages = bigkinds.iter_pages(start, end, first_page)
+    while True :
+        with timed('http', crawl_times) :
+            item = next(pages, None)
+        if item is None :
+            return
+        yield item
 
-        # date_name = date.split('-')[0][2:] + date.split('-')[1] + date.split('-')[2]
+# -----------------------------------
+# 페이지 단위 스트리밍 크롤링 : 페이지마다 DB에 저장 + checkpoint, 재시작 시 이어서 수집
+# -----------------------------------
+def iter_news_pages(start, end=None, collector=None) :
+    end = end or start
+    run_key = f"{start}~{end}"
+    source = {'selenium' : selenium_pages, 'http' : http_pages}[collector or COLLECTOR]
+    con = storage.connect()
 
-        # 최대 기사 수를 가진 데이터의 컬럼 개수 지정
-        max_articles = max(len(articles) for articles in news_by_date.values())
+    try :
+        # 이전 실행에서 이미 저장된 페이지는 다시 크롤링하지 않고 그대로 전달
+        for _, page_df in storage.load_crawl_pages(con, run_key).groupby('page', sort=True) :
+            telemetry.count('pages', 1)
+            yield page_df
 
-        # 최대 기사 수를 컬럼 수로 지정
-        columns = ['date'] + [str(i) for i in range(1, max_articles+1)] + ['news_count']
+        last_page, total_page, done = storage.get_crawl_checkpoint(con, run_key)
+        if done :
+            return
+        if last_page :
+            print(f"{last_page} 페이지까지 수집 완료 -> {last_page + 1} 페이지부터 재개")
 
-        data_rows = []
-        for date, articles in news_by_date.items() :
-            date_str = date.strftime('%Y-%m-%d')
-            news_count = len(articles)
+        ## 뉴스 크롤링
+        for page, total_page, records in source(start, end, last_page + 1) :
+            print(f"=========={page}/{total_page} 페이지 뉴스 기사 크롤링 시작==========")
 
-            row = [date_str] + articles
-            # 최대 기사 수보다 적은 기사 수를 가진 날에는 빈 컬럼값에 NaN 처리
-            if len(articles) < max_articles :
-                row += [pd.NA] * (max_articles - len(articles))
+            # 페이지 기사 저장 + checkpoint 갱신 (하나의 트랜잭션)
+            telemetry.count('pages', 1)
+            yield storage.save_crawl_page(con, run_key, page, total_page, records)
 
-            row += [news_count]
-            data_rows.append(row)
+        print("마지막 페이지에 도달했습니다.")
+        storage.finish_crawl(con, run_key)
+    finally :
+        con.close()
 
-    driver.close()
+def to_articles(pages) :
+    # 페이지별 기사 -> (date, seq, media, text, hash)
+    articles = pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+    articles = articles.reindex(columns=['date', 'media', 'text'])
+    articles['seq'] = articles.groupby('date').cumcount() + 1
+    articles['hash'] = articles['text'].map(storage.article_hash)
 
-    # 데이터프레임 생성
-    news_df = pd.DataFrame(data_rows, columns = columns)
+    return articles[storage.ARTICLE_COLS]
 
-    return news_df
-    
 
 # -----------------------------------
 # 2. sentiment analysis : 뉴스 데이터로부터 감성 확률 계산
 # -----------------------------------
 def analyze_sentiment(text : str) :
-    # 모델 이름
-    MODEL_NAME = "snunlp/KR-FinBert-SC"
+    # 프로세스 내에서 한 번만 로드된 KR-FinBert 모델 재사용
+    return get_scorer().score_one(text)
 
-    # tokenizer initialize
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+@telemetry.instrument('news_analyze')
+def news_analyze(start, end=None) :
+    end = end or start
 
-    # 사전학습된 감성 분류 모델 불러오기
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+    # 크롤링된 페이지가 도착하는 대로 mini-batch 감성 분석 (크롤링 완료 전부터 시작)
+    # 기사가 없는 날도 news_count = 0, avg_neutral = 1.0 으로 포함
+    # (크롤링과 감성 분석이 번갈아 실행되므로 페이지 수는 crawl_news가 아닌 news_analyze 단계에 기록)
+    with timed('crawl+sentiment') :
+        sentiment_df, collected = daily_sentiment_stream(iter_news_pages(start, end), dates=date_range(start, end))
+    telemetry.count('articles', len(collected))
+    telemetry.count('days', len(sentiment_df))
 
-    # 추론 모드
-    model.eval()
-
-    # 입력 문장 토크나이징 및 텐서 변환
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-
-    # 추론 모드에서 모델 실행 (기울기 미계산)
-    with torch.no_grad() :
-        outputs = model(**inputs)
-
-    # softmax를 통해 확률값 벡터화
-    probs = softmax(outputs.logits, dim=1).squeeze().tolist()
-
-    # 결과를 딕셔너리로 반환 (부정/중립/긍정 확률)
-    return {
-        'negative' : probs[0],
-        'neutral' : probs[1],
-        'positive' : probs[2]
-    }
-
-def news_analyze(date) :
-    news_df = crawl_news(date)
-    sentiment_daily = []
-
-    # 전체 날짜 순회
-    for idx, row in tqdm(news_df.iterrows(), total=len(news_df)) :
-        date = row['date']
-        news_count = row['news_count']
-
-        # 기사 컬럼 자동 추출 (숫자 컬럼만)
-        article_cols = [col for col in row.index if col.isdigit()]
-
-        daily_vectors = []
-
-        for col in article_cols :
-            headline = row[col]
-            if isinstance(headline, str) and len(headline.strip()) > 0 :
-                sentiment = analyze_sentiment(headline)
-                daily_vectors.append([
-                    sentiment['negative'],
-                    sentiment['neutral'],
-                    sentiment['positive']
-                ])
-
-        # 기본 딕셔너리 구성
-        sentiment_record = {
-            'date' : date,
-            'news_count' : news_count,
-            **{col : row[col] for col in article_cols} # 기사 원문도 저장
-        }
-
-        # 감성 벡터 평균 게산
-        if daily_vectors :
-            arr = np.array(daily_vectors)
-            avg_vector = arr.mean(axis=0)   # 일별 평균 감성확률
-        else :
-            # 뉴스가 하나도 없을 경우 -> avg_neutral = 1.0
-            avg_vector = [0.0, 1.0, 0.0]
-
-        sentiment_record.update({
-            'avg_negative' : round(avg_vector[0], 4),
-            'avg_neutral' : round(avg_vector[1], 4),
-            'avg_positive' : round(avg_vector[2], 4)
-        })
-
-        sentiment_daily.append(sentiment_record)
-
-    sentiment_df = pd.DataFrame(sentiment_daily)
-
-    return sentiment_df
+    return sentiment_df, to_articles([collected])
 
 # -----------------------------------
-# 3. 주가 데이터 수집
+# 3. 주가 데이터 수집 : start ~ end 기간을 한 번에 요청
 # -----------------------------------
-def stock_data(date) :
-    # 수집 날짜 설정
-    target_date = date
-    next_date = (datetime.strptime(target_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
-
-    # datetime 객체로 변환
-    date_obj = datetime.strptime(target_date, '%Y-%m-%d')
-
-    # weekday()는 월=0, ..., 일=6
-    is_weekend = date_obj.weekday() >= 5 # 토=5, 일=6
-    print(f"Is weekend? {is_weekend}") # True면 주말
-
-    # 삼성전자 티커
-    samsung = yf.Ticker("005930.KS")
-    # yfinance는 end 날짜를 포함하지 않으므로 다음 날을 end 날짜로 설정
-    hist = samsung.history(start=target_date, end=next_date, auto_adjust=False)
-
-    if is_weekend :
-        # 주말인 경우 : 데이터 없음 처리
-        hist = pd.DataFrame([{
-            'date' : target_date,
-            'open' : np.nan,
-            'high' : np.nan,
-            'low' : np.nan,
-            'close' : np.nan,
-            'volume' : np.nan
-        }])
-
-    else :
-        # 평일인 경우 : yfinance로 실제 데이터 요청
-        next_date = (date_obj + timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        if not hist.empty :
-            hist = hist.reset_index()
-            hist.columns = hist.columns.str.lower()
-            hist['date'] = pd.to_datetime(hist['date']).dt.date.astype(str)
-            hist = hist[['date', 'open', 'high', 'low', 'close', 'volume']]
-        else :
-            # 거래일인데 데이터가 없을 경우 (ex. 한국 공휴일)
-            hist = pd.DataFrame([{
-                'date' : target_date,
-                'open' : np.nan,
-                'high' : np.nan,
-                'low' : np.nan,
-                'close' : np.nan,
-                'volume' : np.nan
-            }])
-
-    stock_df = hist.copy()
+@telemetry.instrument('stock_data')
+def stock_data(start, end=None) :
+    end = end or start
+    print(f"수집 기간 {len(date_range(start, end))}일 중 거래일 {trading_calendar.count_trading_days(start, end)}일")
+
+    # 로컬 주가 저장소에 없는 거래일 구간만 yfinance 요청 (주말 / KRX 휴장일은 요청 X)
+    # 비거래일은 데이터 없음(NaN) -> DB 적재 시 직전 거래일 값으로 채움
+    con = storage.connect()
+    try :
+        stock_df = prices.get_prices(con, start, end)
+    finally :
+        con.close()
+    telemetry.count('rows', len(stock_df))
+    telemetry.count('trading_days', stock_df['close'].notna().sum())
 
     return stock_df
 
@@ -363,21 +351,20 @@ def stock_data(date) :
 # -----------------------------------
 # 4. 뉴스 데이터(감성확률 포함) + 주가 데이터 merge : sentiment_df + stock_df
 # -----------------------------------
-def merge_sentiment_stock(date) :
-    previous_date = (datetime.strptime(date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
-    # 파일명 호출을 위한 날짜명 처리 : "2025-05-04" -> "250504"
-    date_name = previous_date.split('-')[0][2:] + previous_date.split('-')[1] + previous_date.split('-')[2]
-
-    # DuckDB에 저장된 가장 최신의 데이터를 불러옴
-    con = duckdb.connect(f'{date_name}_sentiment_stock.duckdb')
+@telemetry.instrument('merge_sentiment_stock')
+def merge_sentiment_stock(start, end=None) :
+    # 수집된 sentiment, stock 불러오기
+    sentiment, articles = news_analyze(start, end)
+    with timed('stock') :
+        stock = stock_data(start, end)
 
-    prep = con.execute("SELECT * FROM merged_data").fetchdf()
-    con.close()
+    with timed('merge') :
+        merged = merge_frames(sentiment, stock)
+    telemetry.count('rows', len(merged))
 
-    # 오늘 수집된 sentiment, stock 불러오기
-    sentiment = news_analyze(date)
-    stock = stock_data(date)
+    return merged, articles
 
+def merge_frames(sentiment, stock) :
     # 날짜 형식 정리
     sentiment['date'] = pd.to_datetime(sentiment['date']).dt.normalize()
     sentiment['date'] = sentiment['date'].dt.strftime('%Y-%m-%d')
@@ -386,65 +373,89 @@ def merge_sentiment_stock(date) :
     stock['date'] = stock['date'].dt.strftime('%Y-%m-%d')
 
     # sentiment + stock merge
-    merged = pd.merge(sentiment, stock, on='date', how='left')
-
-    # 준비된 이전날까지의 데이터(prep)와 오늘 수집된 데이터(merged)를 concat
-    merged = pd.concat([prep, merged], ignore_index=True)
-
-    # 정렬 후 forward fill
-    merged = merged.sort_values('date').reset_index(drop=True)
-    merged[['open', 'high', 'low', 'close', 'volume']] = merged[['open', 'high', 'low', 'close', 'volume']].ffill()
-
-    ## 레이블(target) 생성
-    # target = 이전 날 대비 주가 등락 여부(상승 : 1 / 하락or유지 : 0)
-    merged['next_close'] = merged['close'].shift(-1)    # 다음날 종가 생성
-
-    merged['label'] = (merged['next_close'] > merged['close']).astype(int)
-
-    # 필요없는 컬럼 삭제
-    merged = merged.drop(columns=['next_close'])
-
-    return merged
+    # (forward fill / label은 DB 적재 시 KRX 거래일 기준으로 계산)
+    return pd.merge(sentiment, stock, on='date', how='left')
 
 # -----------------------------------
 # 5. DuckDB 적재
 # -----------------------------------
-import os
-
-def save_db(date):
-    # 날짜 객체 변환
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
-    previous_date = (date_obj - timedelta(days=1)).strftime('%Y-%m-%d')
-
-    # 파일명 처리
-    previous_name = previous_date.split('-')[0][2:] + previous_date.split('-')[1] + previous_date.split('-')[2]
-    today_name = date.split('-')[0][2:] + date.split('-')[1] + date.split('-')[2]
-
-    previous_file = f'{previous_name}_sentiment_stock.duckdb'
-    today_file = f'{today_name}_sentiment_stock.duckdb'
-
-    # 1. 이전 날 파일에서 데이터 로드
-    con_prev = duckdb.connect(previous_file)
-    prep = con_prev.execute("SELECT * FROM merged_data").fetchdf()
-    con_prev.close()
-
-    # 2. 오늘 날짜 기준 데이터 수집 및 병합
-    merged = merge_sentiment_stock(date)
+@telemetry.instrument('save_db')
+def save_db(start, end=None):
+    # 1. 기간 내 데이터 수집 및 병합
+    merged, articles = merge_sentiment_stock(start, end)
+    telemetry.count('rows', len(merged))
+    telemetry.count('articles', len(articles))
+
+    # 2. 단일 DB에 기간 내 모든 날짜 행 + 기사 upsert, 직전 행 label 갱신 (하나의 트랜잭션)
+    with timed('db') :
+        con = storage.connect()
+        storage.upsert_days(con, merged, articles)
+
+        # 적재 완료 -> 임시 크롤링 페이지 / checkpoint 삭제
+        storage.clear_crawl(con, f"{start}~{end or start}")
+        con.close()
+    print(f"DB 적재 완료: {storage.DB_PATH} ({len(merged)}행, 기사 {len(articles)}건)")
 
-    # 3. 오늘 날짜 파일에 저장
-    con = duckdb.connect(today_file)
-    con.execute("DROP TABLE IF EXISTS merged_data")
-    con.register("df", merged)
-    con.execute("CREATE TABLE merged_data AS SELECT * FROM df")
-    con.close()
-
-    # 4. 이전 파일 삭제
-    if os.path.exists(previous_file):
-        os.remove(previous_file)
-        print(f"이전 파일 삭제 완료: {previous_file}")
-    else:
-        print(f"이전 파일이 존재하지 않아 삭제하지 않음: {previous_file}")
+# -----------------------------------
+# 파이프라인 단계 (schedule_run.py) : 단계 사이 데이터는 DB로 전달, 반환값 = 출력 fingerprint
+# crawl -> sentiment ┐
+# price ─────────────┴-> merge
+# -----------------------------------
+def crawl_stage(start, end) :
+    # 페이지별 저장 + checkpoint (실패 후 재시도 시 이어서 수집)
+    with telemetry.measure('crawl_news') :
+        for _ in iter_news_pages(start, end) :
+            pass
 
+    con = storage.connect()
+    try :
+        pages = storage.load_crawl_pages(con, f"{start}~{end}")
+    finally :
+        con.close()
+    print(f"크롤링 완료 : 기사 {len(pages)}건")
+    telemetry.count('articles', len(pages))
+    return frame_fingerprint(pages)
+
+def sentiment_stage(start, end) :
+    con = storage.connect()
+    try :
+        pages = storage.load_crawl_pages(con, f"{start}~{end}")
+        with timed('sentiment') :
+            sentiment_df, _ = daily_sentiment_stream([pages], dates=date_range(start, end))
+        storage.save_daily_sentiment(con, sentiment_df)
+        telemetry.count('articles', len(pages))
+    finally :
+        con.close()
+    return frame_fingerprint(sentiment_df)
+
+def price_stage(start, end) :
+    with timed('stock') :
+        stock = stock_data(start, end)
+    return frame_fingerprint(stock)
+
+def merge_stage(start, end) :
+    run_key = f"{start}~{end}"
+    con = storage.connect()
+    try :
+        # 앞 단계 결과 (주가는 price 단계에서 저장소에 적재됨 -> 다시 요청하지 않음)
+        sentiment = storage.load_daily_sentiment(con, start, end)
+        stock = prices.load_prices(con, start, end)
+        # 크롤링 데이터가 이미 적재/삭제된 경우 (주가만 바뀐 재실행) 기존 기사 유지
+        pages = storage.load_crawl_pages(con, run_key)
+        articles = to_articles([pages]) if len(pages) else None
+
+        with timed('db') :
+            merged = merge_frames(sentiment, stock)
+            # 파생 피처는 features 단계에서 재계산
+            storage.upsert_days(con, merged, articles, with_features=False)
+            storage.clear_crawl(con, run_key)
+
+        stored = con.execute("SELECT * FROM merged_data WHERE date BETWEEN ? AND ? ORDER BY date", [start, end]).fetchdf()
+    finally :
+        con.close()
+    print(f"DB 적재 완료: {storage.DB_PATH} ({len(merged)}행, 기사 {len(pages)}건)")
+    telemetry.count('rows', len(merged))
+    return frame_fingerprint(stored)
 
 
 # -----------------------------------
@@ -453,14 +464,36 @@ def save_db(date):
 if __name__ == "__main__" :
     # 자동 schedule 외 직접 날짜 지정시 사용
     # python update_today_data.py 2025-05-05
-    if len(sys.argv) > 1 :
-        target_date = sys.argv[1]
-    else :
-        target_date = datetime.today().strftime('%Y-%m-%d') # 오늘 날짜
+    # 누락 기간 일괄 수집 : python update_today_data.py --start 2025-05-01 --end 2025-05-07
+    parser = argparse.ArgumentParser()
+    parser.add_argument('date', nargs='?', default=datetime.today().strftime('%Y-%m-%d'))   # 기본 : 오늘 날짜
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--base-url', help="BigKinds 검색 페이지 주소 (로컬 저장본 테스트용)")
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help="브라우저 창 없이 실행 (기본 : CRAWLER_HEADLESS)")
+    parser.add_argument('--collector', choices=COLLECTORS, default=COLLECTOR, help="뉴스 수집 방식 (기본 : NEWS_COLLECTOR 또는 selenium)")
+    parser.add_argument('--sentiment-backend', choices=sentiment_engine.BACKENDS, default=sentiment_engine.SENTIMENT_BACKEND,
+                        help="감성 분석 백엔드 (기본 : SENTIMENT_BACKEND 또는 fp32)")
+    parser.add_argument('--sentiment-threads', type=int, default=sentiment_engine.SENTIMENT_THREADS,
+                        help="감성 분석 torch 스레드 수 (기본 : SENTIMENT_THREADS)")
+    args = parser.parse_args()
+
+    if args.base_url :
+        BIGKINDS_URL = args.base_url
+    HEADLESS = args.headless
+    COLLECTOR = args.collector
+    sentiment_engine.SENTIMENT_BACKEND = args.sentiment_backend
+    sentiment_engine.SENTIMENT_THREADS = args.sentiment_threads
+
+    start = args.start or args.date
+    end = args.end or (args.date if not args.start else args.start)
 
     # 전체 실행
+    reset_stage_times()
     try :
-        save_db(target_date)
-        print(f"{target_date} 데이터 저장 완료")
+        save_db(start, end)
+        print(f"{start} ~ {end} 데이터 저장 완료")
     except Exception as e :
-        print(f"에러발생 : {e}")
\ No newline at end of file
+        print(f"에러발생 : {e}")
+    finally :
+        print_stage_times()